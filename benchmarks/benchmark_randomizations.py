@@ -0,0 +1,192 @@
+"""
+A benchmark suite timing and memory-profiling every Randomizations method across data sizes.
+
+Each case runs one method on a roster of ``participants`` synthetic participants split over ``arms`` groups and, for
+the designs that use them, ``partitions`` strata, covariate levels or clusters. The inputs of a case are built before
+the clock starts, the reported time is the best of ``--repeats`` runs, and the peak memory of one further run is
+traced with ``tracemalloc``, which also sees NumPy's buffers. Results can be saved as a baseline JSON file and later
+runs compared against it, flagging every case that got slower or used more memory than the tolerance allows.
+
+Typical usage example (from the repository root):
+
+  python -m benchmarks.benchmark_randomizations --save baseline.json
+  python -m benchmarks.benchmark_randomizations --compare baseline.json --tolerance 0.25
+  python -m benchmarks.benchmark_randomizations --methods minimization --sizes 1000 100000 --arms 2 10
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from src.randomizations import Randomizations
+
+SIZES = (10**3, 10**4, 10**5, 10**6, 10**7)
+ARMS = (2, 5, 50)
+PARTITIONS = (10, 1000)
+
+def _strata_codes(n_participants, n_partitions, rng):
+    return rng.integers(n_partitions, size=n_participants)
+
+def _covariates(participants, n_partitions, rng):
+    return dict(zip(participants.tolist(), rng.integers(n_partitions, size=len(participants)).tolist()))
+
+def _factor_covariates(participants, n_partitions, rng):
+    levels = rng.integers(n_partitions, size=(len(participants), 3)).tolist()
+    return dict(zip(participants.tolist(), map(tuple, levels)))
+
+def _csr_clusters(n_participants, n_partitions, rng):
+    members = rng.permutation(n_participants)
+    cuts = np.sort(rng.choice(np.arange(1, n_participants), size=min(n_partitions, n_participants) - 1, replace=False))
+    return np.concatenate(([0], cuts, [n_participants])), members
+
+# Each case maps a method name to (uses partitions, builds the call's arguments, runs the method).
+CASES = {
+    'simple_randomization': (False, lambda n, arms, k, rng: (), lambda r: r.simple_randomization()),
+    'simple_randomization_vectorized': (False, lambda n, arms, k, rng: (),
+                                        lambda r: r.simple_randomization(vectorized=True)),
+    'block_randomization': (False, lambda n, arms, k, rng: (2 * arms,), Randomizations.block_randomization),
+    'stratified_randomization': (True, lambda n, arms, k, rng: (_strata_codes(n, k, rng),),
+                                 Randomizations.stratified_randomization),
+    'covariate_adaptive_randomization': (True, lambda n, arms, k, rng: (_covariates(np.arange(n), k, rng),),
+                                         Randomizations.covariate_adaptive_randomization),
+    'permuted_block_randomization': (False, lambda n, arms, k, rng: ([arms, 2 * arms],),
+                                     Randomizations.permuted_block_randomization),
+    'cluster_randomization': (True, lambda n, arms, k, rng: (_csr_clusters(n, k, rng),),
+                              Randomizations.cluster_randomization),
+    'minimization': (True, lambda n, arms, k, rng: (_covariates(np.arange(n), k, rng),), Randomizations.minimization),
+    'pocock_simon_minimization': (True, lambda n, arms, k, rng: (_factor_covariates(np.arange(n), k, rng),),
+                                  Randomizations.pocock_simon_minimization),
+    'rerandomization': (False, lambda n, arms, k, rng: (rng.standard_normal((n, 10)),),
+                        lambda r, covariates: r.rerandomization(covariates, acceptance_probability=0.01)),
+    'hash_randomization': (False, lambda n, arms, k, rng: (), lambda r: r.hash_randomization(salt='benchmark')),
+}
+
+def run_case(method, n_participants, n_arms, n_partitions=None, repeats=3, seed=0):
+    """Times and memory-profiles one method on synthetic inputs.
+
+    Args:
+        method (str): A key of ``CASES``.
+        n_participants (int): The number of participants.
+        n_arms (int): The number of groups.
+        n_partitions (int, optional): The number of strata, covariate levels or clusters, for the methods using them.
+        repeats (int, optional): The number of timed runs; the fastest is reported. Defaults to 3.
+        seed (int, optional): Seeds both the synthetic inputs and the randomizer. Defaults to 0.
+
+    Returns:
+        dict: The case parameters with its best wall time in 'seconds', the 'participants_per_second' it allocated
+            at that pace, and the 'peak_bytes' traced during one run.
+    """
+    _, make_args, call = CASES[method]
+    groups = [f'Arm {arm}' for arm in range(n_arms)]
+    args = make_args(n_participants, n_arms, n_partitions, np.random.default_rng(seed))
+
+    def run():
+        randomizer = Randomizations(np.arange(n_participants), groups, seed=seed)
+        gc.collect()
+        start = time.perf_counter()
+        call(randomizer, *args)
+        return time.perf_counter() - start
+
+    seconds = min(run() for _ in range(repeats))
+    randomizer = Randomizations(np.arange(n_participants), groups, seed=seed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call(randomizer, *args)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'method': method, 'participants': n_participants, 'arms': n_arms, 'partitions': n_partitions,
+            'seconds': seconds, 'participants_per_second': n_participants / seconds if seconds else float('inf'),
+            'peak_bytes': peak_bytes}
+
+def iter_cases(methods, sizes, arms, partitions):
+    """Yields the (method, participants, arms, partitions) parameters of every case in the sweep."""
+    for method in methods:
+        uses_partitions = CASES[method][0]
+        for n_participants in sizes:
+            for n_arms in arms:
+                for n_partitions in (partitions if uses_partitions else (None,)):
+                    if n_partitions is None or n_partitions <= n_participants:
+                        yield method, n_participants, n_arms, n_partitions
+
+def _case_key(result):
+    return (result['method'], result['participants'], result['arms'], result['partitions'])
+
+def compare(results, baseline, tolerance, min_seconds=1e-3, min_bytes=2**16):
+    """Finds the cases that regressed against a baseline.
+
+    A measurement regresses when it exceeds the baseline by more than ``tolerance`` and by more than an absolute
+    noise floor, so that sub-millisecond cases do not flag timer jitter.
+
+    Args:
+        results (list): Results of ``run_case``.
+        baseline (list): Earlier results of ``run_case``; cases missing from it are not compared.
+        tolerance (float): The allowed relative increase in time and peak memory, e.g. 0.25 for 25%.
+        min_seconds (float, optional): The smallest slowdown ever flagged. Defaults to 1 ms.
+        min_bytes (int, optional): The smallest growth in peak memory ever flagged. Defaults to 64 KiB.
+
+    Returns:
+        list: One message per regressed measurement.
+    """
+    baseline_results = {_case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline_results.get(_case_key(result))
+        if reference is None:
+            continue
+        for measure, floor in (('seconds', min_seconds), ('peak_bytes', min_bytes)):
+            if result[measure] > reference[measure] + max(reference[measure] * tolerance, floor):
+                regressions.append(f"{result['method']} (participants={result['participants']}, arms={result['arms']}, "
+                                   f"partitions={result['partitions']}): {measure} {reference[measure]:.4g} -> "
+                                   f"{result[measure]:.4g}")
+    return regressions
+
+def _environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'system': platform.system()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--methods', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES, help="Numbers of participants.")
+    parser.add_argument('--max-participants', type=int, default=None, help="Skip sizes above this number.")
+    parser.add_argument('--arms', nargs='+', type=int, default=ARMS, help="Numbers of groups.")
+    parser.add_argument('--partitions', nargs='+', type=int, default=PARTITIONS,
+                        help="Numbers of strata, covariate levels or clusters.")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--save', help="Write the results to this JSON file as a baseline.")
+    parser.add_argument('--compare', help="Compare the results with this baseline JSON file.")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown or memory growth before a case is flagged. Defaults to 0.25.")
+    options = parser.parse_args(argv)
+
+    sizes = [size for size in options.sizes if options.max_participants is None or size <= options.max_participants]
+    results = []
+    print(f"{'method':34} {'participants':>12} {'arms':>5} {'partitions':>10} {'seconds':>10} {'per second':>12} "
+          f"{'peak MiB':>9}")
+    for method, n_participants, n_arms, n_partitions in iter_cases(options.methods, sizes, options.arms,
+                                                                   options.partitions):
+        result = run_case(method, n_participants, n_arms, n_partitions, options.repeats)
+        results.append(result)
+        print(f"{method:34} {n_participants:>12} {n_arms:>5} {str(n_partitions or '-'):>10} {result['seconds']:>10.4f} "
+              f"{result['participants_per_second']:>12.3g} {result['peak_bytes'] / 2**20:>9.1f}", flush=True)
+
+    if options.save:
+        with open(options.save, 'w') as file:
+            json.dump({'environment': _environment(), 'results': results}, file, indent=2)
+    if options.compare:
+        with open(options.compare) as file:
+            regressions = compare(results, json.load(file)['results'], options.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,4 +10,5 @@ setup(
     version="0.0.1",
     packages=find_packages(),
     install_requires=get_requirements("requirements.txt"),
+    extras_require={"torch": ["torch"]},
 )
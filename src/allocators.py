@@ -0,0 +1,546 @@
+"""
+A module for allocating participants one at a time as they enrol in a trial.
+
+Unlike ``Randomizations``, which needs the full list of participants up front, the allocators in this module are
+stateful: each call to ``assign`` allocates one arriving participant in O(1) amortised time and keeps only the
+running state of the design (the rest of the current block, or the covariate count table), never the history of
+earlier allocations.
+
+Every allocator implements the ``Allocator`` interface. ``SequentialAllocator`` designs draw all allocations from one
+random number generator; ``ConcurrentStratifiedBlockAllocator`` gives each stratum its own generator and lock.
+
+Typical usage example:
+
+  allocator = StratifiedBlockAllocator(['Treatment', 'Control'], block_sizes=[2, 4], seed=42)
+  group = allocator.assign('P1', covariates=('site A', 'female'))
+
+  allocator = MinimizationAllocator(['Treatment', 'Control'], factor_weights=[2, 1], seed=42)
+  group = allocator.assign('P1', covariates=('site A', 'female'))
+
+  allocator = ConcurrentStratifiedBlockAllocator(['Treatment', 'Control'], block_sizes=[2, 4], seed=42)
+  group = allocator.assign('P1', covariates='site A')    # thread-safe; strata allocate concurrently
+
+  state = allocator.get_state()    # JSON-serializable, e.g. for storage.AllocationStore
+  allocator.set_state(state)
+"""
+
+import abc
+import heapq
+import json
+import threading
+
+from .assignments import group_code_dtype
+from .lazy_imports import lazy_import
+from .randomizations import (BIT_GENERATORS, IMBALANCE_METRICS, _check_block_sizes, _fnv1a, _mix64, _pocock_simon_code,
+                             make_generator, permuted_blocks)
+from .schedule_files import _json_safe, seed_metadata
+
+np = lazy_import('numpy')
+
+def _hashable(value):
+    """Turns the lists that JSON makes of tuples back into tuples, so that restored keys are hashable again."""
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+class _BlockSequence():
+    def __init__(self, n_groups, block_sizes, rng):
+        """Initializes an endless sequence of balanced blocks of group codes with randomly chosen sizes.
+
+        Args:
+            n_groups (int): The number of groups.
+            block_sizes (list): The block sizes to choose from; each must be a multiple of ``n_groups``.
+            rng (np.random.Generator): The random number generator to draw from.
+        """
+        self.n_groups = n_groups
+        self.blocks = permuted_blocks(n_groups, block_sizes, rng)
+        self.block = np.empty(0, dtype=np.intp)
+        self.position = 0
+
+    def next_code(self):
+        """Returns the next group code, starting a new block when the current one is used up."""
+        if self.position == len(self.block):
+            self.block = next(self.blocks)
+            self.position = 0
+        self.position += 1
+        return int(self.block[self.position - 1])
+
+    def remaining(self):
+        """Returns the number of codes left in the current block."""
+        return len(self.block) - self.position
+
+    def take(self, n):
+        """Returns up to ``n`` codes from the current block, without starting a new one."""
+        codes = self.block[self.position:self.position + n]
+        self.position += len(codes)
+        return codes
+
+    def next_codes(self, n):
+        """Returns the next ``n`` group codes, drawing the blocks they need exactly as ``n`` calls to ``next_code`` would."""
+        codes = [self.take(n)]
+        n -= len(codes[0])
+        while n > 0:
+            self.block = next(self.blocks)
+            self.position = 0
+            codes.append(self.take(n))
+            n -= len(codes[-1])
+        return np.concatenate(codes)
+
+    def get_state(self):
+        """Returns the current block and the position reached in it."""
+        return {'block': self.block.tolist(), 'position': self.position}
+
+    def set_state(self, state):
+        """Restores the current block and position returned by ``get_state``."""
+        self.block = np.array(state['block'], dtype=group_code_dtype(self.n_groups))
+        self.position = state['position']
+
+def _check_strata(covariates):
+    """Raises a ValueError unless every stratum of a batch is hashable."""
+    for stratum in covariates:
+        try:
+            hash(stratum)
+        except TypeError:
+            raise ValueError(f"Strata must be hashable, got {stratum!r}") from None
+
+class Allocator(abc.ABC):
+    def __init__(self, groups):
+        """Initializes the allocator with the groups to allocate to.
+
+        An allocator allocates participants as they enrol and counts them in ``n_assigned``. Its running state can be
+        saved with ``get_state`` and restored with ``set_state``, e.g. by ``storage.AllocationStore``, and
+        ``service.AllocationService`` allocates micro-batches of requests with ``assign_many``.
+
+        Args:
+            groups (list): List of group names for randomization.
+        """
+        self.groups = list(groups)
+
+    @abc.abstractmethod
+    def assign(self, participant, covariates=None):
+        """Allocates one arriving participant and returns the name of their group."""
+
+    @abc.abstractmethod
+    def assign_many(self, participants, covariates=None):
+        """Allocates a batch of arriving participants, as ``assign`` would one at a time, and returns their groups."""
+
+    @abc.abstractmethod
+    def get_state(self):
+        """Returns the allocator's JSON-serializable running state."""
+
+    @abc.abstractmethod
+    def set_state(self, state):
+        """Restores a state returned by ``get_state``."""
+
+    @staticmethod
+    def _covariate_list(participants, covariates):
+        """Returns the covariates of a batch as a list with one entry per participant."""
+        covariates = [None] * len(participants) if covariates is None else list(covariates)
+        if len(covariates) != len(participants):
+            raise ValueError(f"Expected covariates for {len(participants)} participants, got {len(covariates)}")
+        return covariates
+
+class SequentialAllocator(Allocator):
+    def __init__(self, groups, seed=None, bit_generator='pcg64'):
+        """Initializes an allocator whose allocations all draw from one random number generator.
+
+        Args:
+            groups (list): List of group names for randomization.
+            seed (int or np.random.SeedSequence, optional): Random seed for reproducibility. Defaults to None.
+            bit_generator (str, optional): The bit generator, 'pcg64' or 'philox'. Defaults to 'pcg64'.
+        """
+        super().__init__(groups)
+        self.rng = make_generator(seed, bit_generator)
+        self.n_assigned = 0
+
+    def assign(self, participant, covariates=None):
+        """Allocates one arriving participant.
+
+        Args:
+            participant: The participant identifier.
+            covariates (optional): The participant's stratum or covariate values, if the design uses them.
+
+        Returns:
+            str: The name of the group the participant is allocated to.
+        """
+        self._check_covariates([covariates])
+        code = self._next_code(covariates)
+        self.n_assigned += 1
+        return self.groups[code]
+
+    def assign_many(self, participants, covariates=None):
+        """Allocates a batch of arriving participants in arrival order.
+
+        The allocations are the same as those of calling ``assign`` on each participant in turn, so batching does
+        not change the schedule, but designs that allow it allocate the whole batch with a few vectorised calls.
+        Every participant's covariates are checked before any is allocated, so a batch with an invalid entry raises
+        without changing the allocator's state.
+
+        Args:
+            participants (list): The participant identifiers, in arrival order.
+            covariates (list, optional): The stratum or covariate values of each participant, if the design uses them.
+
+        Returns:
+            list: The name of the group each participant is allocated to.
+
+        Raises:
+            ValueError: If the covariates of any participant do not fit the design.
+        """
+        covariates = self._covariate_list(participants, covariates)
+        self._check_covariates(covariates)
+        codes = self._next_codes(covariates)
+        self.n_assigned += len(participants)
+        return [self.groups[code] for code in codes]
+
+    def _check_covariates(self, covariates):
+        """Raises a ValueError if the covariates of any participant of a batch do not fit the design."""
+
+    def _next_codes(self, covariates):
+        return [self._next_code(participant_covariates) for participant_covariates in covariates]
+
+    def get_state(self):
+        """Returns the allocator's running state, enough to resume allocating without replaying earlier allocations.
+
+        Returns:
+            dict: A JSON-serializable state, including the state of the random number generator.
+        """
+        return {'n_assigned': self.n_assigned, 'rng': _json_safe(self.rng.bit_generator.state)}
+
+    def set_state(self, state):
+        """Restores a state returned by ``get_state`` of an allocator with the same groups and design.
+
+        Args:
+            state (dict): The state to restore.
+        """
+        self.n_assigned = state['n_assigned']
+        self.rng.bit_generator.state = state['rng']
+
+    @abc.abstractmethod
+    def _next_code(self, covariates):
+        """Draws the group code of one arriving participant and updates the running state of the design."""
+
+class SimpleAllocator(SequentialAllocator):
+    """Allocates each participant to a group drawn independently and uniformly at random."""
+
+    def _next_code(self, covariates):
+        return int(self.rng.integers(len(self.groups)))
+
+    def _next_codes(self, covariates):
+        return self.rng.integers(len(self.groups), size=len(covariates)).tolist()
+
+class PermutedBlockAllocator(SequentialAllocator):
+    def __init__(self, groups, block_sizes, seed=None, bit_generator='pcg64'):
+        """Initializes an allocator that follows balanced blocks of randomly chosen sizes.
+
+        Args:
+            groups (list): List of group names for randomization.
+            block_sizes (list): The block sizes to choose from; each must be a multiple of the number of groups.
+            seed (int or np.random.SeedSequence, optional): Random seed for reproducibility. Defaults to None.
+            bit_generator (str, optional): The bit generator, 'pcg64' or 'philox'. Defaults to 'pcg64'.
+        """
+        super().__init__(groups, seed, bit_generator)
+        self.blocks = _BlockSequence(len(self.groups), block_sizes, self.rng)
+
+    def get_state(self):
+        return dict(super().get_state(), blocks=self.blocks.get_state())
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.blocks.set_state(state['blocks'])
+
+    def _next_code(self, covariates):
+        return self.blocks.next_code()
+
+    def _next_codes(self, covariates):
+        return self.blocks.next_codes(len(covariates)).tolist()
+
+class StratifiedBlockAllocator(SequentialAllocator):
+    def __init__(self, groups, block_sizes, seed=None, bit_generator='pcg64'):
+        """Initializes an allocator that follows a separate sequence of permuted blocks within each stratum.
+
+        The stratum of a participant is the hashable ``covariates`` value passed to ``assign``.
+
+        Args:
+            groups (list): List of group names for randomization.
+            block_sizes (list): The block sizes to choose from; each must be a multiple of the number of groups.
+            seed (int or np.random.SeedSequence, optional): Random seed for reproducibility. Defaults to None.
+            bit_generator (str, optional): The bit generator, 'pcg64' or 'philox'. Defaults to 'pcg64'.
+        """
+        super().__init__(groups, seed, bit_generator)
+        self.block_sizes = list(block_sizes)
+        self.strata = {}
+        _check_block_sizes(len(self.groups), self.block_sizes)
+
+    def get_state(self):
+        strata = [[stratum, blocks.get_state()] for stratum, blocks in self.strata.items()]
+        return dict(super().get_state(), strata=_json_safe(strata))
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.strata = {}
+        for stratum, blocks_state in state['strata']:
+            blocks = self.strata[_hashable(stratum)] = _BlockSequence(len(self.groups), self.block_sizes, self.rng)
+            blocks.set_state(blocks_state)
+
+    def _check_covariates(self, covariates):
+        _check_strata(covariates)
+
+    def _next_code(self, covariates):
+        blocks = self.strata.get(covariates)
+        if blocks is None:
+            blocks = self.strata[covariates] = _BlockSequence(len(self.groups), self.block_sizes, self.rng)
+        return blocks.next_code()
+
+    def _next_codes(self, covariates):
+        """Allocates each stratum's arrivals block by block.
+
+        All strata draw their blocks from one generator, so new blocks are drawn in the order in which arrivals
+        first need them, which a heap of the arrival index at which each stratum runs out provides. This keeps the
+        allocations identical to one-at-a-time calls, at a cost per block rather than per participant.
+        """
+        arrivals = {}
+        for i, stratum in enumerate(covariates):
+            arrivals.setdefault(stratum, []).append(i)
+        codes = [0] * len(covariates)
+        needs = []
+        for stratum, indices in arrivals.items():
+            blocks = self.strata.get(stratum)
+            if blocks is None:
+                blocks = self.strata[stratum] = _BlockSequence(len(self.groups), self.block_sizes, self.rng)
+            filled = self._fill(codes, indices, 0, blocks)
+            if filled < len(indices):
+                heapq.heappush(needs, (indices[filled], stratum, filled))
+        while needs:
+            _, stratum, filled = heapq.heappop(needs)
+            blocks = self.strata[stratum]
+            blocks.block, blocks.position = next(blocks.blocks), 0
+            indices = arrivals[stratum]
+            filled = self._fill(codes, indices, filled, blocks)
+            if filled < len(indices):
+                heapq.heappush(needs, (indices[filled], stratum, filled))
+        return codes
+
+    @staticmethod
+    def _fill(codes, indices, filled, blocks):
+        """Gives the next arrivals of a stratum the rest of its current block and returns how many are now filled."""
+        block_codes = blocks.take(len(indices) - filled).tolist()
+        for index, code in zip(indices[filled:filled + len(block_codes)], block_codes):
+            codes[index] = code
+        return filled + len(block_codes)
+
+class MinimizationAllocator(SequentialAllocator):
+    def __init__(self, groups, factor_weights=None, imbalance='range', p=1.0, seed=None, bit_generator='pcg64'):
+        """Initializes an allocator performing multi-factor Pocock-Simon minimization on arrival.
+
+        The covariates passed to ``assign`` are a sequence of factor levels, e.g. ``(site, sex, age_band)``. Levels
+        need not be known in advance: the groups x factors x levels count tensor grows as new levels appear.
+
+        Args:
+            groups (list): List of group names for randomization.
+            factor_weights (list, optional): A weight for each factor. Defaults to equal weights.
+            imbalance (str, optional): The imbalance metric, one of 'range', 'variance' or 'sd'. Defaults to 'range'.
+            p (float, optional): Probability of assigning the participant to the group with the lowest score.
+                Defaults to 1.0.
+            seed (int or np.random.SeedSequence, optional): Random seed for reproducibility. Defaults to None.
+            bit_generator (str, optional): The bit generator, 'pcg64' or 'philox'. Defaults to 'pcg64'.
+        """
+        if imbalance not in IMBALANCE_METRICS:
+            raise ValueError(f"Unknown imbalance metric {imbalance!r}, expected one of {sorted(IMBALANCE_METRICS)}")
+        super().__init__(groups, seed, bit_generator)
+        self.factor_weights = None if factor_weights is None else np.asarray(factor_weights, dtype=float)
+        self.imbalance = imbalance
+        self.p = p
+        self.factor_levels = None
+        self.level_counts = None
+
+    def get_state(self):
+        minimization_state = {'factor_weights': None, 'factor_levels': None, 'level_counts': None}
+        if self.factor_levels is not None:
+            minimization_state = {'factor_weights': self.factor_weights.tolist(),
+                                  'factor_levels': _json_safe([list(levels) for levels in self.factor_levels]),
+                                  'level_counts': self.level_counts.tolist()}
+        return dict(super().get_state(), **minimization_state)
+
+    def set_state(self, state):
+        super().set_state(state)
+        if state['factor_levels'] is None:
+            self.factor_levels = self.level_counts = None
+            return
+        self.factor_weights = np.array(state['factor_weights'], dtype=float)
+        self.factor_levels = [{_hashable(level): i for i, level in enumerate(levels)} for levels in state['factor_levels']]
+        self.level_counts = np.array(state['level_counts'], dtype=np.int64)
+
+    def _check_covariates(self, covariates):
+        n_factors = None if self.factor_levels is None else len(self.factor_levels)
+        if n_factors is None and self.factor_weights is not None:
+            n_factors = len(self.factor_weights)
+        for levels in covariates:
+            try:
+                hash(tuple(levels))
+            except TypeError:
+                raise ValueError(f"Expected a sequence of hashable factor levels, got {levels!r}") from None
+            if n_factors is None:
+                n_factors = len(levels)
+            if len(levels) != n_factors:
+                raise ValueError(f"Expected {n_factors} factor levels, got {len(levels)}")
+
+    def _next_code(self, covariates):
+        if self.factor_levels is None:
+            n_factors = len(covariates)
+            if self.factor_weights is None:
+                self.factor_weights = np.ones(n_factors)
+            if self.factor_weights.shape != (n_factors,):
+                raise ValueError(f"Expected {n_factors} factor weights, got {len(self.factor_weights)}")
+            self.factor_levels = [{} for _ in range(n_factors)]
+            self.level_counts = np.zeros((len(self.groups), n_factors, 4), dtype=np.int64)
+        if len(covariates) != len(self.factor_levels):
+            raise ValueError(f"Expected {len(self.factor_levels)} factor levels, got {len(covariates)}")
+        levels = [factor_levels.setdefault(level, len(factor_levels))
+                  for factor_levels, level in zip(self.factor_levels, covariates)]
+        if max(levels, default=0) >= self.level_counts.shape[2]:
+            self.level_counts = np.pad(self.level_counts, ((0, 0), (0, 0), (0, self.level_counts.shape[2])))
+        factor_index = np.arange(len(levels))
+        code = _pocock_simon_code(self.level_counts[:, factor_index, levels], self.factor_weights,
+                                  IMBALANCE_METRICS[self.imbalance], self.p, self.rng)
+        self.level_counts[code, factor_index, levels] += 1
+        return code
+
+class _Stratum():
+    def __init__(self, n_groups, block_sizes, rng):
+        """Initializes the state of one stratum: its lock, its own generator, its blocks and its allocation count."""
+        self.lock = threading.Lock()
+        self.rng = rng
+        self.blocks = _BlockSequence(n_groups, block_sizes, rng)
+        self.n_assigned = 0
+
+class ConcurrentStratifiedBlockAllocator(Allocator):
+    def __init__(self, groups, block_sizes, seed=None, bit_generator='pcg64'):
+        """Initializes a thread-safe stratified block allocator with a lock and a random number stream per stratum.
+
+        Threads allocating to different strata never wait for each other, apart from a short lock taken once when a
+        stratum is first seen. Each stratum draws from its own generator, seeded by the seed together with a stable
+        hash of the stratum, so a stratum's allocations depend only on the seed and the order of its own arrivals,
+        whatever the interleaving of threads. They therefore differ from those of ``StratifiedBlockAllocator``,
+        whose strata share one generator.
+
+        Args:
+            groups (list): List of group names for randomization.
+            block_sizes (list): The block sizes to choose from; each must be a multiple of the number of groups.
+            seed (int or np.random.SeedSequence, optional): Random seed for reproducibility. Defaults to None.
+            bit_generator (str, optional): The bit generator, 'pcg64' or 'philox'. Defaults to 'pcg64'.
+        """
+        super().__init__(groups)
+        self.block_sizes = list(block_sizes)
+        _check_block_sizes(len(self.groups), self.block_sizes)
+        if bit_generator not in BIT_GENERATORS:
+            raise ValueError(f"Unknown bit generator {bit_generator!r}, expected one of {sorted(BIT_GENERATORS)}")
+        self.bit_generator = bit_generator
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.strata = {}
+        self._strata_lock = threading.Lock()
+
+    @property
+    def n_assigned(self):
+        """int: The number of participants allocated so far, over all strata."""
+        return sum(stratum.n_assigned for stratum in list(self.strata.values()))
+
+    def _stratum(self, covariates):
+        """Returns the state of a stratum, creating it under the creation lock when it is first seen."""
+        stratum = self.strata.get(covariates)
+        if stratum is None:
+            with self._strata_lock:
+                stratum = self.strata.get(covariates)
+                if stratum is None:
+                    stratum = self.strata[covariates] = _Stratum(len(self.groups), self.block_sizes,
+                                                                 self._stratum_generator(covariates))
+        return stratum
+
+    def _stratum_generator(self, covariates):
+        """Builds the generator of a stratum from the seed and a 64-bit FNV-1a hash of the stratum's JSON form."""
+        key = _mix64(_fnv1a(json.dumps(_json_safe(covariates)).encode('utf-8')))
+        seed_sequence = np.random.SeedSequence(self.seed_sequence.entropy,
+                                               spawn_key=tuple(self.seed_sequence.spawn_key) + (key,))
+        return make_generator(seed_sequence, self.bit_generator)
+
+    def assign(self, participant, covariates=None):
+        """Allocates one arriving participant, holding only the lock of their stratum.
+
+        Args:
+            participant: The participant identifier.
+            covariates (optional): The participant's stratum, a hashable value.
+
+        Returns:
+            str: The name of the group the participant is allocated to.
+        """
+        _check_strata([covariates])
+        stratum = self._stratum(covariates)
+        with stratum.lock:
+            code = stratum.blocks.next_code()
+            stratum.n_assigned += 1
+        return self.groups[code]
+
+    def assign_many(self, participants, covariates=None):
+        """Allocates a batch of arriving participants, holding one stratum's lock at a time.
+
+        Each stratum's arrivals are allocated in order with one vectorised call, as ``assign`` would allocate them.
+
+        Args:
+            participants (list): The participant identifiers, in arrival order.
+            covariates (list, optional): The stratum of each participant.
+
+        Returns:
+            list: The name of the group each participant is allocated to.
+        """
+        covariates = self._covariate_list(participants, covariates)
+        _check_strata(covariates)
+        arrivals = {}
+        for i, stratum in enumerate(covariates):
+            arrivals.setdefault(stratum, []).append(i)
+        codes = [0] * len(participants)
+        for covariates, indices in arrivals.items():
+            stratum = self._stratum(covariates)
+            with stratum.lock:
+                stratum_codes = stratum.blocks.next_codes(len(indices)).tolist()
+                stratum.n_assigned += len(indices)
+            for index, code in zip(indices, stratum_codes):
+                codes[index] = code
+        return [self.groups[code] for code in codes]
+
+    def get_state(self):
+        """Returns the seed and the state of every stratum, each read under its own lock.
+
+        Strata are read one at a time, so call this while no thread is allocating to get a consistent snapshot.
+
+        Returns:
+            dict: A JSON-serializable state.
+        """
+        with self._strata_lock:
+            strata = list(self.strata.items())
+        strata_state = []
+        for covariates, stratum in strata:
+            with stratum.lock:
+                strata_state.append([covariates, {'n_assigned': stratum.n_assigned,
+                                                  'rng': stratum.rng.bit_generator.state,
+                                                  'blocks': stratum.blocks.get_state()}])
+        return {'n_assigned': sum(state['n_assigned'] for _, state in strata_state),
+                'seed': seed_metadata(self.seed_sequence, self.bit_generator), 'strata': _json_safe(strata_state)}
+
+    def set_state(self, state):
+        """Restores a state returned by ``get_state``, including the seed that streams of new strata derive from.
+
+        Args:
+            state (dict): The state to restore.
+        """
+        seed = state['seed']
+        self.bit_generator = seed['bit_generator']
+        self.seed_sequence = np.random.SeedSequence(seed['entropy'], spawn_key=seed['spawn_key'])
+        strata = {}
+        for covariates, stratum_state in state['strata']:
+            covariates = _hashable(covariates)
+            stratum = strata[covariates] = _Stratum(len(self.groups), self.block_sizes,
+                                                    self._stratum_generator(covariates))
+            stratum.rng.bit_generator.state = stratum_state['rng']
+            stratum.blocks.set_state(stratum_state['blocks'])
+            stratum.n_assigned = stratum_state['n_assigned']
+        with self._strata_lock:
+            self.strata = strata
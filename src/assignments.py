@@ -0,0 +1,238 @@
+"""
+A module for representing the result of a randomization as an array of integer group codes.
+
+An Assignment stores one small integer code per participant, aligned to an array of participant identifiers, instead
+of a Python list of identifiers per group. Downstream consumers can read the code array directly, while the
+dictionary-of-lists interface returned by earlier versions of ``Randomizations`` is kept as a lazy view.
+
+A ParticipantIndex interns participant identifiers once as contiguous integer positions, so that algorithms can work
+on integer arrays and only map back to identifiers at the output boundary.
+
+Typical usage example:
+
+  assignment = randomizer.simple_randomization()
+  assignment.codes                 # np.ndarray of int8 group codes, aligned to assignment.participants
+  assignment['Treatment']          # list of participants assigned to 'Treatment'
+  assignment.group_sizes()         # {'Treatment': 4, 'Control': 4}
+  assignment.group_of('P3')        # 'Control'
+"""
+
+from collections.abc import Mapping
+
+from .lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+def group_code_dtype(n_groups):
+    """Returns the smallest signed integer dtype able to hold a code for each of ``n_groups`` groups.
+
+    Args:
+        n_groups (int): The number of groups.
+
+    Returns:
+        np.dtype: int8, int16, int32 or int64.
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_groups <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _sortable_kind(dtype):
+    """Returns the family of a NumPy dtype whose values can be binary searched against each other, or None."""
+    return {'i': 'integer', 'u': 'integer', 'U': 'unicode', 'S': 'bytes'}.get(dtype.kind)
+
+def _as_id_array(participants):
+    """Returns participant identifiers as a NumPy array, without copying arrays."""
+    if isinstance(participants, np.ndarray):
+        return participants
+    return np.fromiter(participants, dtype=object, count=len(participants))
+
+class ParticipantIndex():
+    def __init__(self, participants):
+        """Interns participant identifiers as contiguous integer positions 0..n-1.
+
+        Single lookups use a hash map from identifiers to positions. Batched lookups of integer or string arrays
+        against identifiers stored in an array of the same kind binary search a sorted copy of the identifiers
+        instead, so millions of identifiers are resolved without Python work per identifier. Both structures are
+        built on first use.
+
+        Args:
+            participants (list or np.ndarray): Distinct participant identifiers. NumPy arrays are stored without copying.
+        """
+        self.ids = _as_id_array(participants)
+        self.dtype = np.dtype(np.int32 if len(self.ids) < 2**31 else np.int64)
+        self._positions = None
+        self._order = None
+        self._sorted_ids = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _lookup(self):
+        if self._positions is None:
+            self._positions = {participant: i for i, participant in enumerate(self.ids.tolist())}
+            if len(self._positions) != len(self.ids):
+                raise ValueError("Participant identifiers must be distinct")
+        return self._positions
+
+    def position(self, participant):
+        """Returns the interned position of one participant.
+
+        Args:
+            participant: The participant identifier.
+
+        Returns:
+            int: The participant's position.
+        """
+        return self._lookup()[participant]
+
+    def positions(self, participants):
+        """Returns the interned positions of many participants.
+
+        Args:
+            participants (list or np.ndarray): Participant identifiers.
+
+        Returns:
+            np.ndarray: The int32 (or, past 2^31 participants, int64) position of each participant.
+
+        Raises:
+            KeyError: If a participant is not in the index.
+        """
+        if (isinstance(participants, np.ndarray) and _sortable_kind(self.ids.dtype) is not None
+                and _sortable_kind(participants.dtype) == _sortable_kind(self.ids.dtype)):
+            return self._sorted_positions(participants)
+        lookup = self._lookup()
+        if isinstance(participants, np.ndarray):
+            participants = participants.tolist()
+        return np.fromiter(map(lookup.__getitem__, participants), dtype=self.dtype, count=len(participants))
+
+    def _sorted_positions(self, participants):
+        """Finds positions by binary search in the sorted identifiers, O(log n) per identifier.
+
+        The queries are sorted first so that consecutive searches touch nearby memory.
+        """
+        if self._sorted_ids is None:
+            self._order = np.argsort(self.ids, kind='stable').astype(self.dtype)
+            self._sorted_ids = self.ids[self._order]
+            if (self._sorted_ids[1:] == self._sorted_ids[:-1]).any():
+                raise ValueError("Participant identifiers must be distinct")
+        query_order = np.argsort(participants)
+        found = np.empty(len(participants), dtype=np.intp)
+        found[query_order] = np.searchsorted(self._sorted_ids, participants[query_order])
+        np.minimum(found, max(len(self.ids) - 1, 0), out=found)
+        if len(participants) and (len(self.ids) == 0 or (self._sorted_ids[found] != participants).any()):
+            raise KeyError("Some participants are not in the index")
+        return self._order[found]
+
+    def ids_at(self, positions):
+        """Maps interned positions back to participant identifiers.
+
+        Args:
+            positions (np.ndarray): Interned positions.
+
+        Returns:
+            np.ndarray: The identifier at each position.
+        """
+        return self.ids[positions]
+
+class Assignment(Mapping):
+    def __init__(self, participants, groups, codes):
+        """Initializes an Assignment from participant identifiers and their group codes.
+
+        The assignment behaves as a read-only mapping from group names to lists of participants, so it can be used
+        wherever the dictionaries returned by earlier versions were. Member lists are built on access and list
+        participants in the order they appear in ``participants``.
+
+        Args:
+            participants (list or np.ndarray): Participant identifiers. NumPy arrays are stored without copying.
+            groups (list): List of group names; code ``k`` refers to ``groups[k]``.
+            codes (array-like): The group code of each participant, aligned to ``participants``.
+        """
+        self.participants = _as_id_array(participants)
+        self.groups = list(groups)
+        self.codes = np.asarray(codes, dtype=group_code_dtype(len(self.groups)))
+        if self.codes.shape != self.participants.shape[:1]:
+            raise ValueError(f"Expected {len(self.participants)} group codes, got {len(self.codes)}")
+        self._group_codes = {group: code for code, group in enumerate(self.groups)}
+        self._index = None
+
+    @property
+    def index(self):
+        """ParticipantIndex: The reverse index from participants to their position, built on first use."""
+        if self._index is None:
+            self._index = ParticipantIndex(self.participants)
+        return self._index
+
+    def __getitem__(self, group):
+        return self.participants[self.codes == self._group_codes[group]].tolist()
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __contains__(self, group):
+        return group in self._group_codes
+
+    def __repr__(self):
+        return f"{type(self).__name__}(participants={len(self.participants)}, group_sizes={self.group_sizes()})"
+
+    def group_sizes(self):
+        """Counts the participants assigned to each group.
+
+        Returns:
+            dict: A dictionary with group names as keys and the count of participants in each group as values.
+        """
+        counts = np.bincount(self.codes, minlength=len(self.groups))
+        return {group: int(count) for group, count in zip(self.groups, counts)}
+
+    def group_labels(self):
+        """Returns the group name of every participant, aligned to ``participants``.
+
+        Returns:
+            list: The assigned group name of each participant.
+        """
+        return np.asarray(self.groups, dtype=object)[self.codes].tolist()
+
+    def group_of(self, participant):
+        """Returns the group a participant is assigned to, in O(1) through the reverse index.
+
+        Args:
+            participant: The participant identifier.
+
+        Returns:
+            str: The name of the participant's group.
+        """
+        return self.groups[self.codes[self.index.position(participant)]]
+
+    def codes_for(self, participants):
+        """Returns the group codes of many participants at once, in the order given.
+
+        Args:
+            participants (list or np.ndarray): Participant identifiers, each of which must be part of the assignment.
+
+        Returns:
+            np.ndarray: The group code of each participant.
+        """
+        return self.codes[self.index.positions(participants)]
+
+    def groups_of(self, participants):
+        """Returns the groups of many participants at once, in the order given.
+
+        Args:
+            participants (list or np.ndarray): Participant identifiers, each of which must be part of the assignment.
+
+        Returns:
+            list: The name of each participant's group.
+        """
+        return np.asarray(self.groups, dtype=object)[self.codes_for(participants)].tolist()
+
+    def to_dict(self):
+        """Materializes the assignment as a dictionary of participant lists.
+
+        Returns:
+            dict: A dictionary with group names as keys and lists of assigned participants as values.
+        """
+        return {group: self[group] for group in self.groups}
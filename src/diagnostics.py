@@ -0,0 +1,249 @@
+"""
+A module for checking the covariate balance of a randomized assignment.
+
+All summaries come from one chunked pass over the covariate matrix. Each chunk is grouped by assignment code with a
+one-hot matrix product, which gives the per-group sums and sums of squares of every covariate at once. A second
+product gives the covariance matrix. From these the report derives standardized mean differences and variance
+ratios against a reference group, and an omnibus Mahalanobis imbalance over all covariates. Categorical covariates
+are tested with chi-square tests on contingency tables built by one ``bincount`` per covariate. P-values use the
+chi-square survival function below, so SciPy is not needed.
+
+Typical usage example:
+
+  assignment = randomizer.simple_randomization(vectorized=True)
+  report = balance_report(assignment, covariates, categorical=sites)
+  report['smd']                      # (groups, covariates) standardized mean differences against the first group
+  report['mahalanobis']['p_value']
+"""
+
+import math
+
+from .assignments import Assignment
+from .lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+def chi2_sf(statistic, df):
+    """Computes the survival function of the chi-square distribution for an integer number of degrees of freedom.
+
+    Uses the closed forms of the regularized upper incomplete gamma function at integer and half-integer shapes.
+    The terms are summed in log space, so large statistics with many degrees of freedom neither underflow nor
+    overflow.
+
+    Args:
+        statistic (float): The chi-square statistic.
+        df (int): The degrees of freedom, at least 1.
+
+    Returns:
+        float: The probability that a chi-square variable with ``df`` degrees of freedom exceeds ``statistic``.
+    """
+    if df < 1:
+        raise ValueError(f"Degrees of freedom must be at least 1, got {df}")
+    if statistic <= 0:
+        return 1.0
+    half = statistic / 2
+    if df % 2 == 0:
+        log_terms = [-half + i * math.log(half) - math.lgamma(i + 1) for i in range(df // 2)]
+        tail = 0.0
+    else:
+        log_term = 0.5 * math.log(2 * statistic / math.pi) - half
+        log_terms = []
+        for i in range(1, (df + 1) // 2):
+            log_terms.append(log_term)
+            log_term += math.log(statistic / (2 * i + 1))
+        tail = math.erfc(math.sqrt(half))
+    if not log_terms:
+        return min(1.0, tail)
+    largest = max(log_terms)
+    return min(1.0, tail + math.exp(largest) * math.fsum(math.exp(term - largest) for term in log_terms))
+
+def chi2_isf(probability, df):
+    """Computes the inverse survival function of the chi-square distribution by bisection on ``chi2_sf``.
+
+    Args:
+        probability (float): The upper tail probability, in (0, 1).
+        df (int): The degrees of freedom, at least 1.
+
+    Returns:
+        float: The statistic whose survival function is ``probability``.
+    """
+    if not 0 < probability < 1:
+        raise ValueError(f"The tail probability must be in (0, 1), got {probability}")
+    low, high = 0.0, float(df)
+    while chi2_sf(high, df) > probability:
+        low, high = high, 2 * high
+    for _ in range(200):
+        middle = (low + high) / 2
+        if chi2_sf(middle, df) > probability:
+            low = middle
+        else:
+            high = middle
+        if high - low <= 1e-12 * high:
+            break
+    return (low + high) / 2
+
+def whitening(covariance, tolerance=1e-10):
+    """Computes a whitening matrix of a covariance matrix, dropping directions without variance.
+
+    Args:
+        covariance (np.ndarray): A symmetric positive semi-definite (p, p) matrix.
+        tolerance (float, optional): Eigenvalues below ``tolerance`` times the largest are treated as zero.
+            Defaults to 1e-10.
+
+    Returns:
+        np.ndarray: A (p, r) matrix W, where r is the rank of ``covariance``, such that ``W.T @ covariance @ W`` is the
+            identity and ``x @ W @ W.T @ x`` is the squared Mahalanobis norm of ``x``.
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    keep = eigenvalues > tolerance * max(eigenvalues.max(initial=0.0), 0.0)
+    return eigenvectors[:, keep] / np.sqrt(eigenvalues[keep])
+
+def group_moments(codes, covariates, n_groups, max_bytes=2**28, covariance=True):
+    """Groups covariates by assignment code in one chunked pass.
+
+    Rows are shifted by the first row before accumulating, which keeps the sums of squares accurate for covariates
+    with a large mean.
+
+    Args:
+        codes (np.ndarray): The group code of each participant.
+        covariates (np.ndarray): An (n_participants, n_covariates) numeric matrix. Float32 input stays float32 within
+            each chunk; the sums are accumulated in float64.
+        n_groups (int): The number of groups.
+        max_bytes (int, optional): Approximate working memory allowed per chunk. Defaults to 256 MiB.
+        covariance (bool, optional): Whether to also compute the covariance matrix. Defaults to True.
+
+    Returns:
+        dict: The 'counts' (groups,), 'means' and 'variances' (groups, covariates), the overall 'mean' (covariates,)
+            and, if requested, the overall 'covariance' (covariates, covariates), all with one degree of freedom
+            removed per group or overall.
+    """
+    n_participants, n_covariates = covariates.shape
+    dtype = covariates.dtype if covariates.dtype == np.float32 else np.float64
+    shift = covariates[0].astype(np.float64) if n_participants else np.zeros(n_covariates)
+    sums = np.zeros((n_groups, n_covariates))
+    squares = np.zeros((n_groups, n_covariates))
+    cross_products = np.zeros((n_covariates, n_covariates)) if covariance else None
+    group_index = np.arange(n_groups, dtype=codes.dtype)
+    rows_per_chunk = max(1, max_bytes // max(1, 3 * n_covariates * np.dtype(dtype).itemsize))
+    for start in range(0, n_participants, rows_per_chunk):
+        chunk = covariates[start:start + rows_per_chunk].astype(dtype) - shift.astype(dtype)
+        one_hot = (codes[start:start + rows_per_chunk, None] == group_index).astype(dtype)
+        sums += one_hot.T @ chunk
+        squares += one_hot.T @ (chunk * chunk)
+        if covariance:
+            cross_products += chunk.T @ chunk
+
+    counts = np.bincount(codes, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts[:, None]
+        variances = (squares - sums * means) / (counts[:, None] - 1)
+    moments = {'counts': counts, 'means': means + shift, 'variances': variances}
+    overall_sum = sums.sum(axis=0)
+    moments['mean'] = overall_sum / max(n_participants, 1) + shift
+    if covariance:
+        moments['covariance'] = ((cross_products - np.outer(overall_sum, overall_sum) / max(n_participants, 1))
+                                 / max(n_participants - 1, 1))
+    return moments
+
+def chi_square_tests(codes, categorical, n_groups):
+    """Tests the independence of the assignment and each categorical covariate.
+
+    Args:
+        codes (np.ndarray): The group code of each participant.
+        categorical (np.ndarray): An (n_participants, n_categorical) array of category labels.
+        n_groups (int): The number of groups.
+
+    Returns:
+        dict: The Pearson chi-square 'statistic', the degrees of freedom 'df' and the 'p_value' of each categorical
+            covariate, as arrays. Levels and groups without participants do not count towards the degrees of freedom.
+    """
+    statistics, dfs, p_values = [], [], []
+    for column in categorical.T:
+        levels, level_codes = np.unique(column, return_inverse=True)
+        table = np.bincount(codes.astype(np.intp) * len(levels) + level_codes.reshape(-1),
+                            minlength=n_groups * len(levels)).reshape(n_groups, len(levels))
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / max(table.sum(), 1)
+        statistic = float(((table - expected) ** 2 / expected).sum()) if table.size else 0.0
+        df = (table.shape[0] - 1) * (table.shape[1] - 1)
+        statistics.append(statistic)
+        dfs.append(df)
+        p_values.append(chi2_sf(statistic, df) if df > 0 else 1.0)
+    return {'statistic': np.array(statistics), 'df': np.array(dfs, dtype=np.int64), 'p_value': np.array(p_values)}
+
+def mahalanobis_imbalance(moments):
+    """Computes the omnibus Mahalanobis imbalance of the group means.
+
+    The statistic is the sum over groups of n_k (m_k - m)' S^-1 (m_k - m), where m_k are the group means, m the
+    overall mean and S the covariance matrix. Under randomization it is approximately chi-square distributed with
+    (groups - 1) x rank(S) degrees of freedom.
+
+    Args:
+        moments (dict): The output of ``group_moments`` with its covariance.
+
+    Returns:
+        dict: The 'statistic', its 'df' and 'p_value'.
+    """
+    counts = moments['counts']
+    present = counts > 0
+    whitened = (moments['means'][present] - moments['mean']) @ whitening(moments['covariance'])
+    statistic = float(counts[present] @ (whitened * whitened).sum(axis=1))
+    df = int((present.sum() - 1) * whitened.shape[1])
+    return {'statistic': statistic, 'df': df, 'p_value': chi2_sf(statistic, df) if df > 0 else 1.0}
+
+def balance_report(assignment, covariates=None, categorical=None, n_groups=None, reference=0, max_bytes=2**28):
+    """Summarizes how well an assignment balances numeric and categorical covariates across groups.
+
+    Args:
+        assignment (Assignment or np.ndarray): The assignment, or the group code of each participant. Covariates are
+            aligned to ``assignment.participants`` or to the codes.
+        covariates (array-like, optional): An (n_participants, n_covariates) numeric matrix, or a vector for a single
+            covariate.
+        categorical (array-like, optional): An (n_participants, n_categorical) array of category labels, or a vector
+            for a single categorical covariate.
+        n_groups (int, optional): The number of groups. Defaults to the groups of ``assignment``, or to the largest
+            code plus one.
+        reference (int or str, optional): The code or group name that differences are measured against.
+            Defaults to 0, the first group.
+        max_bytes (int, optional): Approximate working memory allowed per chunk. Defaults to 256 MiB.
+
+    Returns:
+        dict: The 'group_sizes' and, when ``covariates`` is given, the group 'means' and 'variances', the
+            standardized mean differences 'smd' (difference in means over the square root of the average of the
+            two variances), the 'variance_ratio' of each group to the reference, the 'max_abs_smd' and the omnibus
+            'mahalanobis' imbalance; when ``categorical`` is given, the 'chi_square' tests. Arrays are indexed by
+            (group code, covariate).
+    """
+    if isinstance(assignment, Assignment):
+        codes = assignment.codes
+        n_groups = len(assignment.groups) if n_groups is None else n_groups
+        if isinstance(reference, str):
+            reference = assignment.groups.index(reference)
+    else:
+        codes = np.asarray(assignment)
+        if n_groups is None:
+            n_groups = int(codes.max()) + 1 if len(codes) else 0
+    if not 0 <= reference < n_groups:
+        raise ValueError(f"The reference group must be one of the {n_groups} group codes, got {reference}")
+
+    report = {'group_sizes': np.bincount(codes, minlength=n_groups)}
+    if covariates is not None:
+        covariates = np.asarray(covariates)
+        covariates = covariates.reshape(len(covariates), -1)
+        if len(covariates) != len(codes):
+            raise ValueError(f"Expected covariates for {len(codes)} participants, got {len(covariates)}")
+        moments = group_moments(codes, covariates, n_groups, max_bytes)
+        means, variances = moments['means'], moments['variances']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            smd = (means - means[reference]) / np.sqrt((variances + variances[reference]) / 2)
+            variance_ratio = variances / variances[reference]
+        report.update(means=means, variances=variances, smd=smd, variance_ratio=variance_ratio,
+                      max_abs_smd=float(np.nanmax(np.abs(smd), initial=0.0)),
+                      mahalanobis=mahalanobis_imbalance(moments))
+    if categorical is not None:
+        categorical = np.asarray(categorical)
+        categorical = categorical.reshape(len(categorical), -1)
+        if len(categorical) != len(codes):
+            raise ValueError(f"Expected categorical covariates for {len(codes)} participants, got {len(categorical)}")
+        report['chi_square'] = chi_square_tests(codes, categorical, n_groups)
+    return report
@@ -0,0 +1,156 @@
+"""
+A module for opt-in instrumentation of the randomization hot paths.
+
+A Metrics registry collects per-method wall times and allocation counts, counters such as random number draws and
+imbalance-score evaluations, and gauges such as group sizes, and forwards every measurement to any registered
+callbacks, e.g. to export them to a monitoring system. Instrumentation is off unless a registry is passed in: the
+uninstrumented code paths then only pay one ``is None`` check per method call.
+
+Typical usage example:
+
+  metrics = Metrics()
+  metrics.add_callback(lambda kind, name, value: print(kind, name, value))
+  randomizer = Randomizations(participants, groups, seed=42, metrics=metrics)
+  randomizer.minimization(covariates)
+  metrics.allocations_per_second('minimization')
+  metrics.counters['rng_draws']
+"""
+
+import functools
+import time
+
+
+class Metrics():
+    def __init__(self):
+        """Initializes an empty metrics registry.
+
+        Attributes:
+            counters (dict): Running totals by name, e.g. 'rng_draws' or 'imbalance_evaluations'.
+            gauges (dict): The last value observed by name, e.g. 'group_size.Treatment'.
+            timers (dict): Per method name, a dictionary of its number of 'calls', total 'seconds' and total
+                'allocations'.
+        """
+        self.counters = {}
+        self.gauges = {}
+        self.timers = {}
+        self.callbacks = []
+
+    def add_callback(self, callback):
+        """Registers a callable receiving every measurement as ``callback(kind, name, value)``.
+
+        ``kind`` is 'counter', 'gauge' or 'timer'; timers report the seconds of one call.
+
+        Args:
+            callback (callable): The callback.
+        """
+        self.callbacks.append(callback)
+
+    def _notify(self, kind, name, value):
+        for callback in self.callbacks:
+            callback(kind, name, value)
+
+    def increment(self, name, value=1):
+        """Adds to a counter.
+
+        Args:
+            name (str): The counter name.
+            value (int, optional): The amount to add. Defaults to 1.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+        self._notify('counter', name, value)
+
+    def observe(self, name, value):
+        """Sets a gauge to its latest value.
+
+        Args:
+            name (str): The gauge name.
+            value (float): The observed value.
+        """
+        self.gauges[name] = value
+        self._notify('gauge', name, value)
+
+    def record_call(self, name, seconds, n_allocations):
+        """Records one timed call of a method.
+
+        Args:
+            name (str): The method name.
+            seconds (float): The wall time of the call.
+            n_allocations (int): The number of participants the call allocated.
+        """
+        timer = self.timers.setdefault(name, {'calls': 0, 'seconds': 0.0, 'allocations': 0})
+        timer['calls'] += 1
+        timer['seconds'] += seconds
+        timer['allocations'] += n_allocations
+        self._notify('timer', name, seconds)
+
+    def allocations_per_second(self, name):
+        """Returns the allocation throughput of a method over all its recorded calls.
+
+        Args:
+            name (str): The method name.
+
+        Returns:
+            float: Participants allocated per second of wall time, or 0.0 if the method was never timed.
+        """
+        timer = self.timers.get(name)
+        if timer is None or timer['seconds'] == 0:
+            return 0.0
+        return timer['allocations'] / timer['seconds']
+
+    def snapshot(self):
+        """Returns a copy of every measurement.
+
+        Returns:
+            dict: The 'counters', 'gauges' and 'timers', with each method's 'allocations_per_second' added.
+        """
+        timers = {name: dict(timer, allocations_per_second=self.allocations_per_second(name))
+                  for name, timer in self.timers.items()}
+        return {'counters': dict(self.counters), 'gauges': dict(self.gauges), 'timers': timers}
+
+    def reset(self):
+        """Clears every measurement, keeping the callbacks."""
+        self.counters.clear()
+        self.gauges.clear()
+        self.timers.clear()
+
+class CountingGenerator():
+    def __init__(self, rng, metrics):
+        """Wraps a ``np.random.Generator`` so that its calls and the random values they produce are counted.
+
+        Every method of the wrapped generator is available unchanged. Each call increments the 'rng_calls' counter
+        and adds the number of values produced (or, for ``shuffle``, permuted) to 'rng_draws'.
+
+        Args:
+            rng (np.random.Generator): The generator to wrap.
+            metrics (Metrics): The registry to count in.
+        """
+        self.rng = rng
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        attribute = getattr(self.rng, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def counted(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            self.metrics.increment('rng_calls')
+            self.metrics.increment('rng_draws', len(args[0]) if result is None else getattr(result, 'size', 1))
+            return result
+        return counted
+
+def timed(method):
+    """Decorates a method returning an ``Assignment`` so that instrumented instances record its wall time.
+
+    The instance's ``metrics`` attribute is checked first, so uninstrumented instances run the method directly.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        result = method(self, *args, **kwargs)
+        self.metrics.record_call(method.__name__, time.perf_counter() - start, len(result.codes))
+        return result
+    return wrapper
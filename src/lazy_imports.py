@@ -0,0 +1,70 @@
+"""
+A module for deferring the import of heavy dependencies until they are first used.
+
+Importing NumPy takes far longer than importing this package, which matters to short-lived processes such as
+serverless allocation workers that may only need the pure-Python code paths, e.g. ``Randomizations.hash_assign``.
+Modules of this package therefore bind NumPy through ``lazy_import``, and the real import only runs on the first
+attribute access, e.g. the first ``np.asarray``.
+
+The binding is a proxy rather than a module in ``sys.modules``. The first attribute access imports the real module
+under a lock, so threads that all reach their first NumPy call at once wait for one complete import instead of
+seeing a half-executed module. The proxy then copies the module's attributes, so later accesses cost no more than
+on the module itself.
+
+Typical usage example:
+
+  np = lazy_import('numpy')
+  np.arange(4)  # NumPy is imported here
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+
+class _LazyModule(types.ModuleType):
+    def __init__(self, name):
+        """Initializes a proxy for a module that is imported on first attribute access.
+
+        Args:
+            name (str): The absolute name of the module.
+        """
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        """Imports the module once, under the lock, and copies its attributes onto the proxy."""
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__.update(module.__dict__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+
+def lazy_import(name):
+    """Returns a module, or a proxy that imports it when one of its attributes is first accessed.
+
+    Args:
+        name (str): The absolute name of the module.
+
+    Returns:
+        module: The module if something imported it before, otherwise a thread-safe proxy for it.
+
+    Raises:
+        ModuleNotFoundError: If the module is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
@@ -0,0 +1,74 @@
+"""
+A module for spreading Monte Carlo randomization workloads over a pool of processes.
+
+The draws of a workload are split into tasks of a fixed number of draws, and task k always draws from the k-th child
+of the workload's SeedSequence. Because neither the split nor the streams depend on the number of workers, the
+results are bit-identical whether a workload runs serially, on a laptop, or on a 64-core machine.
+
+Typical usage example:
+
+  executor = ParallelExecutor(max_workers=8, draws_per_task=1000)
+  design = randomizer.batch_design('block', block_size=4)
+  draws = np.concatenate(executor.map(design.draw, n_draws=100000, seed=42))
+  result = PermutationTest(randomizer, outcomes, design='block', block_size=4).run(assignment, executor=executor)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .lazy_imports import lazy_import
+from .randomizations import make_generator
+
+np = lazy_import('numpy')
+
+_worker_task = None
+
+def _install_task(function, args, bit_generator):
+    """Stores the workload of a pool in each worker process, so it is pickled once per worker rather than per task."""
+    global _worker_task
+    _worker_task = (function, args, bit_generator)
+
+def _run_task(seed_sequence, n_draws, function, args, bit_generator):
+    """Runs one task with a fresh Generator built from the task's seed sequence."""
+    return function(make_generator(seed_sequence, bit_generator), n_draws, *args)
+
+def _run_installed_task(seed_sequence, n_draws):
+    """Runs one task of the installed workload in a worker process."""
+    return _run_task(seed_sequence, n_draws, *_worker_task)
+
+class ParallelExecutor():
+    def __init__(self, max_workers=None, draws_per_task=1000):
+        """Initializes an executor that runs Monte Carlo draws in a ``ProcessPoolExecutor``.
+
+        Args:
+            max_workers (int, optional): The number of worker processes; 1 runs every task in the calling process.
+                Defaults to None, the number of CPUs.
+            draws_per_task (int, optional): The number of draws per task. Results depend on it, so keep it fixed to
+                reproduce earlier results. Defaults to 1000.
+        """
+        self.max_workers = max_workers
+        self.draws_per_task = draws_per_task
+
+    def map(self, function, n_draws, seed, args=(), bit_generator='pcg64'):
+        """Runs ``function(rng, n_task_draws, *args)`` over consecutive tasks that together make ``n_draws`` draws.
+
+        ``function`` and ``args`` must be picklable, e.g. a module-level function or a method of a ``BatchDesign``.
+
+        Args:
+            function (callable): The task function; it receives a fresh Generator and the number of draws of the task.
+            n_draws (int): The total number of draws.
+            seed (int or np.random.SeedSequence): The seed the task streams are spawned from.
+            args (tuple, optional): Extra arguments passed to every task. Defaults to ().
+            bit_generator (str, optional): The bit generator of the task streams, 'pcg64' or 'philox'. Defaults to 'pcg64'.
+
+        Returns:
+            list: The result of every task, in task order.
+        """
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        task_sizes = [min(self.draws_per_task, n_draws - start) for start in range(0, n_draws, self.draws_per_task)]
+        task_seeds = seed_sequence.spawn(len(task_sizes))
+        if self.max_workers == 1:
+            return [_run_task(task_seed, task_size, function, args, bit_generator)
+                    for task_seed, task_size in zip(task_seeds, task_sizes)]
+        with ProcessPoolExecutor(self.max_workers, initializer=_install_task,
+                                 initargs=(function, args, bit_generator)) as pool:
+            return list(pool.map(_run_installed_task, task_seeds, task_sizes))
@@ -0,0 +1,187 @@
+"""
+A module for Fisher randomization tests (permutation tests) of treatment effects in randomized experiments.
+
+Under the sharp null hypothesis of no effect for any participant, the outcomes are fixed and only the assignment is
+random. The null distribution of the test statistic is therefore obtained by re-drawing assignments under the same
+design that produced the observed one, respecting its strata, blocks and clusters, and the p-value is the share of
+those assignments whose statistic is at least as extreme as the observed one. Assignments are drawn in chunks and the
+statistic of a whole chunk is evaluated with matrix-vector products.
+
+Typical usage example:
+
+  randomizer = Randomizations(participants, ['Treatment', 'Control'], seed=42)
+  assignment = randomizer.block_randomization(block_size=4)
+  test = PermutationTest(randomizer, outcomes, design='block', block_size=4)
+  result = test.run(assignment, n_draws=10000)
+  result['p_value']
+"""
+
+from .assignments import Assignment
+from .lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+ALTERNATIVES = ('two-sided', 'greater', 'less')
+
+# Bytes per code of the temporaries of ``difference_in_means``: a boolean indicator and its float64 cast.
+_STATISTIC_BYTES = 9
+
+def difference_in_means(codes, outcomes, treatment_code, control_code, max_bytes=2**22):
+    """Computes the difference in mean outcomes between two groups for many assignments at once.
+
+    Group sums are matrix-vector products of the group indicators and the outcomes. The indicators are built and cast
+    to floating point a slice of rows at a time, so the temporaries stay within ``max_bytes`` however many
+    assignments are passed.
+
+    Args:
+        codes (np.ndarray): An (n_assignments, n_participants) array of group codes.
+        outcomes (np.ndarray): The outcome of each participant.
+        treatment_code (int): The code of the treated group.
+        control_code (int): The code of the control group.
+        max_bytes (int, optional): Approximate working memory allowed for the temporaries. Defaults to 4 MiB.
+
+    Returns:
+        np.ndarray: The difference in means of each assignment.
+    """
+    n_assignments, n_participants = codes.shape
+    rows_per_slice = max(1, max_bytes // max(1, _STATISTIC_BYTES * n_participants))
+    differences = np.empty(n_assignments)
+    for start in range(0, n_assignments, rows_per_slice):
+        chunk = codes[start:start + rows_per_slice]
+        treated = chunk == treatment_code
+        n_treated = np.count_nonzero(treated, axis=1)
+        treated_sums = treated.astype(np.float64) @ outcomes
+        del treated
+        control = chunk == control_code
+        n_control = np.count_nonzero(control, axis=1)
+        control_sums = control.astype(np.float64) @ outcomes
+        with np.errstate(invalid='ignore', divide='ignore'):
+            differences[start:start + len(chunk)] = treated_sums / n_treated - control_sums / n_control
+    return differences
+
+def count_extreme(statistics, observed, alternative):
+    """Counts the statistics at least as extreme as the observed one.
+
+    Args:
+        statistics (np.ndarray): Statistics of assignments drawn under the null hypothesis.
+        observed (float): The observed statistic.
+        alternative (str): One of 'two-sided', 'greater' or 'less'.
+
+    Returns:
+        int: The number of statistics at least as extreme as ``observed``.
+    """
+    tolerance = 1e-9 * max(1.0, abs(observed))
+    if alternative == 'greater':
+        return int(np.count_nonzero(statistics >= observed - tolerance))
+    if alternative == 'less':
+        return int(np.count_nonzero(statistics <= observed + tolerance))
+    return int(np.count_nonzero(np.abs(statistics) >= abs(observed) - tolerance))
+
+def _count_extreme_draws(rng, n_draws, batch_design, outcomes, treatment_code, control_code, alternative, observed,
+                         max_bytes):
+    """Draws assignments under a design and counts those whose statistic is at least as extreme as the observed one."""
+    rows_per_chunk = batch_design.rows_per_chunk(max_bytes // 2)
+    extreme = 0
+    for start in range(0, n_draws, rows_per_chunk):
+        codes = batch_design.draw(rng, min(rows_per_chunk, n_draws - start))
+        statistics = difference_in_means(codes, outcomes, treatment_code, control_code, max_bytes // 2)
+        extreme += count_extreme(statistics, observed, alternative)
+    return extreme
+
+class PermutationTest():
+    def __init__(self, randomizer, outcomes, design='simple', treatment=None, control=None, alternative='two-sided',
+                 block_size=None, strata=None, clusters=None):
+        """Initializes a randomization test of the difference in mean outcomes between two groups.
+
+        Args:
+            randomizer (Randomizations): The randomizer whose participants, groups and random number generator are used.
+            outcomes (array-like): The outcome of each participant, aligned to ``randomizer.participants``.
+            design (str, optional): The design the observed assignment was drawn from, one of 'simple', 'block',
+                'stratified' or 'cluster'. Defaults to 'simple'.
+            treatment (str, optional): The treated group. Defaults to the first group.
+            control (str, optional): The control group. Defaults to the second group.
+            alternative (str, optional): One of 'two-sided', 'greater' or 'less'. Defaults to 'two-sided'.
+            block_size (int, optional): The block size of the 'block' design.
+            strata (dict or np.ndarray, optional): The strata of the 'stratified' design.
+            clusters (dict or np.ndarray, optional): The clusters of the 'cluster' design.
+        """
+        if alternative not in ALTERNATIVES:
+            raise ValueError(f"Unknown alternative {alternative!r}, expected one of {ALTERNATIVES}")
+        self.randomizer = randomizer
+        self.outcomes = np.asarray(outcomes, dtype=np.float64)
+        if self.outcomes.shape != (len(randomizer.participants),):
+            raise ValueError(f"Expected {len(randomizer.participants)} outcomes, got {len(self.outcomes)}")
+        self.design = design
+        self.design_args = {'block_size': block_size, 'strata': strata, 'clusters': clusters}
+        self.treatment_code = randomizer.groups.index(randomizer.groups[0] if treatment is None else treatment)
+        self.control_code = randomizer.groups.index(randomizer.groups[1] if control is None else control)
+        self.alternative = alternative
+
+    def statistics(self, codes, max_bytes=2**22):
+        """Computes the difference in mean outcomes between the treated and control groups for many assignments.
+
+        Args:
+            codes (np.ndarray): An (n_assignments, n_participants) array of group codes.
+            max_bytes (int, optional): Approximate working memory allowed for the temporaries. Defaults to 4 MiB.
+
+        Returns:
+            np.ndarray: The difference in means of each assignment.
+        """
+        return difference_in_means(codes, self.outcomes, self.treatment_code, self.control_code, max_bytes)
+
+    def count_extreme(self, statistics, observed):
+        """Counts the statistics at least as extreme as the observed one under the test's alternative.
+
+        Args:
+            statistics (np.ndarray): Statistics of assignments drawn under the null hypothesis.
+            observed (float): The observed statistic.
+
+        Returns:
+            int: The number of statistics at least as extreme as ``observed``.
+        """
+        return count_extreme(statistics, observed, self.alternative)
+
+    def run(self, assignment, n_draws=10000, exact=False, max_exact=10**6, max_bytes=2**28, executor=None):
+        """Runs the randomization test for an observed assignment.
+
+        The Monte Carlo p-value is (1 + extreme draws) / (1 + n_draws), which is valid for any number of draws. The
+        exact p-value enumerates every assignment the design can produce, so it is only feasible for small designs.
+
+        Args:
+            assignment (Assignment or array-like): The observed assignment, or the group code of each participant
+                aligned to ``randomizer.participants``.
+            n_draws (int, optional): The number of Monte Carlo draws. Defaults to 10000.
+            exact (bool, optional): Whether to enumerate all assignments instead of sampling them. Defaults to False.
+            max_exact (int, optional): The largest number of assignments to enumerate. Defaults to 10^6.
+            max_bytes (int, optional): Approximate working memory allowed per chunk of draws, shared equally between
+                the draws and the computation of their statistics. Defaults to 256 MiB.
+            executor (ParallelExecutor, optional): Spreads the Monte Carlo draws over worker processes, drawing from
+                children of ``randomizer.seed_sequence`` instead of ``randomizer.rng``. Defaults to None.
+
+        Returns:
+            dict: The observed 'statistic', its 'p_value', the number of assignments used ('n_draws') and whether the
+                p-value is 'exact'.
+        """
+        if isinstance(assignment, Assignment):
+            codes = assignment.codes_for(self.randomizer.participants)
+        else:
+            codes = np.asarray(assignment)
+        observed = float(self.statistics(codes[None, :])[0])
+
+        if exact:
+            n_assignments = self.randomizer.assignment_count(self.design, **self.design_args)
+            if n_assignments > max_exact:
+                raise ValueError(f"The design has {n_assignments} assignments, more than max_exact={max_exact}")
+            chunks = self.randomizer.iter_all_assignments(self.design, max_bytes // 2, **self.design_args)
+            extreme = sum(self.count_extreme(self.statistics(chunk, max_bytes // 2), observed) for chunk in chunks)
+            return {'statistic': observed, 'p_value': extreme / n_assignments, 'n_draws': n_assignments, 'exact': True}
+
+        if executor is not None:
+            batch_design = self.randomizer.batch_design(self.design, **self.design_args)
+            args = (batch_design, self.outcomes, self.treatment_code, self.control_code, self.alternative, observed, max_bytes)
+            extreme = sum(executor.map(_count_extreme_draws, n_draws, self.randomizer.seed_sequence, args,
+                                       self.randomizer.bit_generator))
+        else:
+            chunks = self.randomizer.iter_assignment_matrix(self.design, n_draws, max_bytes // 2, **self.design_args)
+            extreme = sum(self.count_extreme(self.statistics(chunk, max_bytes // 2), observed) for chunk in chunks)
+        return {'statistic': observed, 'p_value': (1 + extreme) / (1 + n_draws), 'n_draws': n_draws, 'exact': False}
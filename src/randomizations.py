@@ -2,7 +2,8 @@
 A module for implementing various randomization techniques for Randomized Controlled Trials (RCTs).
 
 This module provides functions for simple randomization, block randomization, stratified randomization,
-covariate-adaptive randomization, permuted block randomization, cluster randomization, and minimization.
+covariate-adaptive randomization, permuted block randomization, cluster randomization, minimization,
+multi-factor Pocock-Simon minimization, and Morgan-Rubin rerandomization.
 These methods ensure unbiased allocation of participants to different study groups.
 
 Typical usage example:
@@ -16,50 +17,429 @@ Typical usage example:
   stratified_groups = randomizer.stratified_randomization(strata)
   covariate_groups = randomizer.covariate_adaptive_randomization(covariates)
   permuted_block_groups = randomizer.permuted_block_randomization(block_sizes=[2, 4])
+  schedule = randomizer.permuted_block_schedule(block_sizes=[2, 4], n_allocations=1000)
+  randomizer.export_schedule('schedule.bin', block_sizes=[2, 4], n_allocations=10**6)
   cluster_groups = randomizer.cluster_randomization(clusters)
   minimized_groups = randomizer.minimization(covariates)
+  rerandomized_groups = randomizer.rerandomization(covariate_matrix, acceptance_probability=0.01)
+  pocock_simon_groups = randomizer.pocock_simon_minimization(factor_covariates, factor_weights=[2, 1])
   randomizer.randomization_check(simple_groups)
+  block_draws = randomizer.assignment_matrix('block', n_draws=1000, block_size=4)
+
+Run ``python -m src.randomizations`` from the repository root to print each technique's result on a small example.
+The module imports the rest of the package relatively, so ``python src/randomizations.py`` does not work.
 """
 
-import random
-import numpy as np
-from collections import defaultdict
+import bisect
+import itertools
+import logging
+import math
+from .assignments import Assignment, ParticipantIndex, group_code_dtype
+from .diagnostics import balance_report, chi2_isf, group_moments, whitening
+from .instrumentation import CountingGenerator, timed
+from .lazy_imports import lazy_import
+from .schedule_files import seed_metadata, write_schedule
+
+np = lazy_import('numpy')
+
+BIT_GENERATORS = {
+    'pcg64': 'PCG64',
+    'philox': 'Philox',
+}
+
+_MASK64 = (1 << 64) - 1
+_FNV_OFFSET = 0xcbf29ce484222325
+_FNV_PRIME = 0x100000001b3
+_MIX_MULTIPLIERS = (0xbf58476d1ce4e5b9, 0x94d049bb133111eb)
+
+IMBALANCE_METRICS = {
+    'range': lambda counts: counts.max(axis=1) - counts.min(axis=1),
+    'variance': lambda counts: counts.var(axis=1),
+    'sd': lambda counts: counts.std(axis=1),
+}
+
+def make_generator(seed=None, bit_generator='pcg64'):
+    """Builds an independent random number generator.
+
+    Args:
+        seed (int or np.random.SeedSequence, optional): The seed. Defaults to None, fresh entropy from the OS.
+        bit_generator (str, optional): The bit generator, 'pcg64' or 'philox'. Defaults to 'pcg64'.
+
+    Returns:
+        np.random.Generator: The generator.
+    """
+    if bit_generator not in BIT_GENERATORS:
+        raise ValueError(f"Unknown bit generator {bit_generator!r}, expected one of {sorted(BIT_GENERATORS)}")
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return np.random.Generator(getattr(np.random, BIT_GENERATORS[bit_generator])(seed_sequence))
+
+def _pocock_simon_code(marginal_counts, weights, imbalance_metric, p, rng):
+    """Chooses the group code of one arrival by Pocock-Simon minimization.
+
+    Args:
+        marginal_counts (np.ndarray): A groups x factors array counting, for each factor, the participants in each
+            group that share the arrival's level of that factor.
+        weights (np.ndarray): The weight of each factor.
+        imbalance_metric (callable): Maps candidate count arrays of shape (groups, groups, factors) to imbalances.
+        p (float): Probability of choosing the group with the lowest score rather than one of the others.
+        rng (np.random.Generator): Breaks ties and draws the biased coin.
+
+    Returns:
+        int: The chosen group code.
+    """
+    n_groups = len(marginal_counts)
+    scores = imbalance_metric(marginal_counts + np.eye(n_groups, dtype=marginal_counts.dtype)[:, :, None]) @ weights
+    best_groups = np.flatnonzero(scores <= scores.min() + 1e-9)
+    group_index = best_groups[rng.integers(len(best_groups))]
+    if p < 1 and n_groups > 1 and rng.random() >= p:
+        group_index = (group_index + 1 + rng.integers(n_groups - 1)) % n_groups
+    return int(group_index)
+
+def _check_block_sizes(n_groups, block_sizes):
+    """Raises a ValueError unless every block size is a positive multiple of the number of groups."""
+    if not block_sizes or any(size <= 0 or size % n_groups for size in block_sizes):
+        raise ValueError(f"Block sizes must be positive multiples of the number of groups ({n_groups})")
+
+def permuted_blocks(n_groups, block_sizes, rng):
+    """Lazily yields an endless sequence of balanced blocks of group codes.
+
+    The size of each block is drawn at random from ``block_sizes``, and each block holds every group code equally
+    often in random order. Only the current block is ever held in memory.
+
+    Args:
+        n_groups (int): The number of groups.
+        block_sizes (list): The block sizes to choose from; each must be a multiple of ``n_groups``.
+        rng (np.random.Generator): The random number generator to draw from.
+
+    Returns:
+        generator: Yields one np.ndarray of group codes per block.
+    """
+    _check_block_sizes(n_groups, block_sizes)
+    return _iter_permuted_blocks(n_groups, list(block_sizes), rng)
+
+def _iter_permuted_blocks(n_groups, block_sizes, rng):
+    codes = np.arange(n_groups, dtype=group_code_dtype(n_groups))
+    while True:
+        yield rng.permutation(np.resize(codes, block_sizes[rng.integers(len(block_sizes))]))
+
+def _fnv1a(data, state=_FNV_OFFSET):
+    """Continues a 64-bit FNV-1a hash over the given bytes."""
+    for byte in data:
+        state = ((state ^ byte) * _FNV_PRIME) & _MASK64
+    return state
+
+def _mix64(state):
+    """Applies the SplitMix64 finalizer so that every input bit affects every output bit."""
+    state = ((state ^ (state >> 30)) * _MIX_MULTIPLIERS[0]) & _MASK64
+    state = ((state ^ (state >> 27)) * _MIX_MULTIPLIERS[1]) & _MASK64
+    return state ^ (state >> 31)
+
+def _fnv1a_array(ids, state):
+    """Vectorised ``_mix64(_fnv1a(id, state))`` over an array of byte strings, one pass per byte column."""
+    byte_columns = ids.view(np.uint8).reshape(len(ids), ids.dtype.itemsize)
+    lengths = np.char.str_len(ids)
+    hashes = np.full(len(ids), state, dtype=np.uint64)
+    for column in range(ids.dtype.itemsize):
+        hashes = np.where(lengths > column, (hashes ^ byte_columns[:, column]) * np.uint64(_FNV_PRIME), hashes)
+    return _mix64_array(hashes)
+
+def _mix64_array(states):
+    """Vectorised ``_mix64`` over an array of uint64 states."""
+    states = (states ^ (states >> np.uint64(30))) * np.uint64(_MIX_MULTIPLIERS[0])
+    states = (states ^ (states >> np.uint64(27))) * np.uint64(_MIX_MULTIPLIERS[1])
+    return states ^ (states >> np.uint64(31))
+
+def _id_bytes(participant):
+    """Returns the bytes hashed for a participant identifier."""
+    return participant if isinstance(participant, bytes) else str(participant).encode('utf-8')
+
+def _roster_copy(participants):
+    """Returns a copy of a roster that later in-place edits of the roster do not reach."""
+    return participants.copy() if isinstance(participants, np.ndarray) else list(participants)
+
+def _same_roster(copy, participants):
+    """Returns whether a roster still holds the identifiers of a copy made by ``_roster_copy``, in the same order."""
+    if isinstance(participants, np.ndarray):
+        return isinstance(copy, np.ndarray) and np.array_equal(copy, participants)
+    return isinstance(copy, list) and copy == (participants if isinstance(participants, list) else list(participants))
+
+def _concatenate_members(member_lists):
+    """Concatenates the member lists of strata or clusters into one identifier array, without hashing identifiers.
+
+    Args:
+        member_lists (iterable): The participant lists.
+
+    Returns:
+        tuple: The identifier array, and the start and size of each list in it as int64 arrays.
+    """
+    member_lists = list(member_lists)
+    sizes = np.fromiter(map(len, member_lists), dtype=np.int64, count=len(member_lists))
+    members = np.fromiter(itertools.chain.from_iterable(member_lists), dtype=object, count=int(sizes.sum()))
+    return members, np.cumsum(sizes) - sizes, sizes
+
+def _utf8_array(ids):
+    """Returns identifiers as a bytes array holding their UTF-8 encoding, as ``_id_bytes`` would give them.
+
+    ASCII strings are converted by narrowing their code points to single bytes, and integers by a NumPy cast. Only
+    strings holding non-ASCII characters, and other kinds of identifiers, are encoded one by one.
+    """
+    if ids.dtype.kind == 'S':
+        return ids
+    if ids.dtype.kind in 'iu':
+        return ids.astype('S')
+    if ids.dtype.kind != 'U':
+        return np.char.encode(ids.astype(str), 'utf-8')
+    width = ids.dtype.itemsize // 4
+    if len(ids) == 0 or width == 0:
+        return np.zeros(len(ids), dtype='S1')
+    code_points = ids.view(np.uint32).reshape(len(ids), width)
+    non_ascii = np.flatnonzero(code_points.max(axis=1) >= 128)
+    if len(non_ascii):
+        code_points = code_points.copy()
+        code_points[non_ascii] = 0
+    result = np.ascontiguousarray(code_points.astype(np.uint8)).view(f'S{width}').reshape(len(ids))
+    if len(non_ascii):
+        encoded = np.char.encode(ids[non_ascii], 'utf-8')
+        result = result.astype(f'S{max(width, encoded.dtype.itemsize)}')
+        result[non_ascii] = encoded
+    return result
+
+def _check_csr(partition, n_participants):
+    """Checks that a CSR tuple ``(offsets, members)`` lists positions of ``n_participants`` participants, one each.
+
+    Args:
+        partition (tuple): The offsets of each cluster or stratum into ``members``, and the participant positions.
+        n_participants (int): The number of participants.
+
+    Returns:
+        tuple: The offsets and members as NumPy arrays.
+
+    Raises:
+        ValueError: If the offsets do not start at 0, decrease or do not end at ``len(members)``, or if the members are
+            not positions of every participant.
+    """
+    offsets, members = (np.asarray(array) for array in partition)
+    if offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != len(members) \
+            or (np.diff(offsets) < 0).any():
+        raise ValueError(f"CSR offsets must rise from 0 to the number of members ({len(members)})")
+    if len(members) != n_participants or (len(members) and (members.min() < 0 or members.max() >= n_participants)):
+        raise ValueError("The clusters must cover every participant exactly once")
+    return offsets, members
+
+def _hashable_level(value):
+    """Returns a covariate value as a hashable key, turning lists into tuples so that equal lists share a level."""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        if isinstance(value, (list, tuple)):
+            return tuple(_hashable_level(item) for item in value)
+        raise ValueError(f"Covariate values must be hashable or lists, got {value!r}") from None
+
+def _cyclic_codes(n, n_groups):
+    """Returns the group codes 0, 1, ..., n_groups - 1, 0, 1, ... for n consecutive positions."""
+    return np.resize(np.arange(n_groups, dtype=group_code_dtype(n_groups)), n)
+
+def _multiset_permutations(values):
+    """Yields every distinct ordering of ``values`` exactly once, in lexicographic order."""
+    values = sorted(values)
+    while True:
+        yield tuple(values)
+        i = len(values) - 2
+        while i >= 0 and values[i] >= values[i + 1]:
+            i -= 1
+        if i < 0:
+            return
+        j = len(values) - 1
+        while values[j] <= values[i]:
+            j -= 1
+        values[i], values[j] = values[j], values[i]
+        values[i + 1:] = reversed(values[i + 1:])
+
+class BatchDesign():
+    def __init__(self, pattern, segments=None, clusters=None):
+        """Compiles a randomization design to integer arrays so that many assignments can be drawn at once.
+
+        The design permutes the randomization units (participants, or clusters) and gives the unit landing at
+        position q the code ``pattern[q]``. Units sharing a segment (block or stratum) are only permuted among
+        themselves: units are ordered by a 64-bit sort key packing the segment label above random bits, so
+        ``pattern`` lists the codes of each segment in label order.
+
+        Args:
+            pattern (np.ndarray): The group code given to each position of the permuted units.
+            segments (np.ndarray, optional): The segment label of each unit. Defaults to None, a single segment.
+            clusters (np.ndarray, optional): The unit index of each participant when units are clusters. Defaults to None.
+        """
+        self.pattern = pattern
+        self.segments = segments
+        self.clusters = clusters
+        if segments is not None:
+            self._random_bits = 64 - (int(segments.max()).bit_length() if len(segments) else 0)
+            self._segment_keys = segments.astype(np.uint64) << np.uint64(self._random_bits)
+
+    def rows_per_chunk(self, max_bytes):
+        """Returns how many assignments can be drawn at once within approximately ``max_bytes`` of working memory."""
+        unit_bytes = self.pattern.itemsize if self.segments is None else 17 + self.pattern.itemsize
+        participant_bytes = 0 if self.clusters is None else len(self.clusters) * self.pattern.itemsize
+        return max(1, max_bytes // max(1, len(self.pattern) * unit_bytes + participant_bytes))
+
+    def draw(self, rng, n_rows):
+        """Draws independent assignments under the design.
+
+        Random numbers are consumed one assignment at a time, so drawing rows in several calls gives the same rows
+        as drawing them in one.
+
+        Args:
+            rng (np.random.Generator): The random number generator to draw from.
+            n_rows (int): The number of assignments to draw.
+
+        Returns:
+            np.ndarray: An (n_rows, n_participants) array of group codes.
+        """
+        if self.segments is None:
+            unit_codes = np.tile(self.pattern, (n_rows, 1))
+            rng.permuted(unit_codes, axis=1, out=unit_codes)
+        else:
+            keys = rng.integers(0, 1 << self._random_bits, (n_rows, len(self.pattern)), dtype=np.uint64)
+            keys |= self._segment_keys
+            order = np.argsort(keys, axis=1)
+            unit_codes = np.empty(keys.shape, dtype=self.pattern.dtype)
+            np.put_along_axis(unit_codes, order, np.broadcast_to(self.pattern, keys.shape), axis=1)
+        if self.clusters is not None:
+            return unit_codes[:, self.clusters]
+        return unit_codes
+
+    def _segment_patterns(self):
+        """Returns the unit indices of each segment together with the codes the segment's units are permuted over."""
+        if self.segments is None:
+            return [(np.arange(len(self.pattern)), self.pattern)]
+        order = np.argsort(self.segments, kind='stable')
+        boundaries = np.flatnonzero(np.diff(self.segments[order])) + 1
+        return list(zip(np.split(order, boundaries), np.split(self.pattern, boundaries)))
+
+    def count(self):
+        """Returns the number of distinct assignments the design can produce, all equally likely."""
+        total = 1
+        for _, pattern in self._segment_patterns():
+            arrangements = math.factorial(len(pattern))
+            for code_count in np.unique(pattern, return_counts=True)[1]:
+                arrangements //= math.factorial(int(code_count))
+            total *= arrangements
+        return total
+
+    def enumerate(self, rows_per_chunk):
+        """Enumerates every distinct assignment of the design exactly once.
+
+        Args:
+            rows_per_chunk (int): The number of assignments per chunk.
+
+        Yields:
+            np.ndarray: An (rows, n_participants) array of group codes.
+        """
+        segment_arrangements = [(units, np.array(list(_multiset_permutations(pattern.tolist())), dtype=self.pattern.dtype))
+                                for units, pattern in self._segment_patterns()]
+        total = math.prod(len(arrangements) for _, arrangements in segment_arrangements)
+        for start in range(0, total, rows_per_chunk):
+            index = np.arange(start, min(start + rows_per_chunk, total))
+            unit_codes = np.empty((len(index), len(self.pattern)), dtype=self.pattern.dtype)
+            for units, arrangements in segment_arrangements:
+                unit_codes[:, units] = arrangements[index % len(arrangements)]
+                index //= len(arrangements)
+            yield unit_codes if self.clusters is None else unit_codes[:, self.clusters]
 
 class Randomizations():
-    def __init__(self, participants, groups, seed=None):
+    def __init__(self, participants, groups, seed=None, bit_generator='pcg64', metrics=None):
         """Initializes the Randomizations class with participants and groups.
 
+        Each instance owns its own ``numpy.random.Generator``, so independent randomizers never share or clobber
+        global random state and can run concurrently. Independent, reproducible streams for many randomizers can be
+        obtained by passing the children of ``np.random.SeedSequence(seed).spawn(n)`` as seeds.
+
+        Passing a ``Metrics`` registry instruments the instance: every allocation method records its wall time and
+        the number of participants it allocated, the generator counts its random draws, and the minimization methods
+        count their imbalance-score evaluations. Without a registry none of this is done.
+
         Args:
             participants (list): List of participant identifiers.
             groups (list): List of group names for randomization.
-            seed (int, optional): Random seed for reproducibility. Defaults to None.
+            seed (int or np.random.SeedSequence, optional): Random seed for reproducibility. Defaults to None.
+            bit_generator (str, optional): The bit generator backing the instance, 'pcg64' or 'philox'. Defaults to 'pcg64'.
+            metrics (Metrics, optional): The registry to record instrumentation in. Defaults to None, no instrumentation.
         """
         self.participants = participants
         self.groups = groups
         self.seed = seed
-        if seed is not None:
-            self.set_random_seed(seed)
+        self.bit_generator = bit_generator
+        self.metrics = metrics
+        self.set_random_seed(seed)
+        self._index = None
+
+    @property
+    def index(self):
+        """ParticipantIndex: The participants interned as integer positions, built on first use.
+
+        The index is built from a copy of ``participants`` and rebuilt whenever the roster no longer equals that copy,
+        so replacing, reordering or editing ``participants`` in place never leaves results on stale positions.
+        """
+        if self._index is None or not _same_roster(self._indexed_participants, self.participants):
+            self._indexed_participants = _roster_copy(self.participants)
+            self._index = ParticipantIndex(self._indexed_participants)
+        return self._index
 
     def set_random_seed(self, seed):
-        """Sets the random seed for reproducibility.
+        """Resets the instance's random number generator for reproducibility.
+
+        The seed sequence and generator are only built when first used, so that code paths which draw no random
+        numbers, such as ``hash_assign``, never import NumPy.
 
         Args:
-            seed (int): The random seed value.
+            seed (int or np.random.SeedSequence): The random seed value. None draws fresh entropy from the OS.
         """
-        random.seed(seed)
-        np.random.seed(seed)
+        self._seed_source = seed
+        self._seed_sequence = None
+        self._rng = None
+
+    @property
+    def seed_sequence(self):
+        """np.random.SeedSequence: The root of the instance's random streams, built on first use."""
+        if self._seed_sequence is None:
+            seed = self._seed_source
+            self._seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        return self._seed_sequence
+
+    @property
+    def rng(self):
+        """np.random.Generator: The instance's random number generator, built on first use."""
+        if self._rng is None:
+            self._rng = make_generator(self.seed_sequence, self.bit_generator)
+            if self.metrics is not None:
+                self._rng = CountingGenerator(self._rng, self.metrics)
+        return self._rng
     
-    def simple_randomization(self):
+    @timed
+    def simple_randomization(self, vectorized=False):
         """Performs simple randomization of participants into groups.
 
+        By default ``participants`` is shuffled in place and split into strided groups. The vectorized path leaves
+        ``participants`` untouched and instead permutes an array of group codes aligned to it, which needs one byte
+        per participant for up to 128 groups and handles rosters of 10^8 participants in seconds.
+
+        Args:
+            vectorized (bool, optional): Whether to permute group codes instead of the participant list. Defaults to False.
+
         Returns:
-            dict: A dictionary with group names as keys and lists of assigned participants as values.
+            Assignment: The group code of each participant, viewable as a dictionary of participant lists per group.
         """
         if self.seed is not None:
             self.set_random_seed(self.seed)
-        random.shuffle(self.participants)
-        return {group: self.participants[i::len(self.groups)] for i, group in enumerate(self.groups)}
+        if vectorized:
+            codes = _cyclic_codes(len(self.participants), len(self.groups))
+            self.rng.shuffle(codes)
+            return Assignment(self.participants, self.groups, codes)
+        self.rng.shuffle(self.participants)
+        return Assignment(self.participants, self.groups, _cyclic_codes(len(self.participants), len(self.groups)))
     
+    @timed
     def block_randomization(self, block_size):
         """Performs block randomization of participants into groups with a specified block size.
 
@@ -67,115 +447,579 @@ class Randomizations():
             block_size (int): The size of each block.
 
         Returns:
-            dict: A dictionary with group names as keys and lists of assigned participants as values.
+            Assignment: The group code of each participant, viewable as a dictionary of participant lists per group.
         """
-        blocks = [self.participants[i:i + block_size] for i in range(0, len(self.participants), block_size)]
-        randomized_blocks = []
-        for block in blocks:
-            random.shuffle(block)
-            randomized_blocks.extend(block)
-        return {group: randomized_blocks[i::len(self.groups)] for i, group in enumerate(self.groups)}
+        index = self.index
+        n_participants = len(index)
+        order = np.arange(n_participants, dtype=index.dtype)
+        for start in range(0, n_participants, block_size):
+            self.rng.shuffle(order[start:start + block_size])
+        return Assignment(index.ids_at(order), self.groups, _cyclic_codes(n_participants, len(self.groups)))
 
+    @timed
     def stratified_randomization(self, strata):
         """Performs stratified randomization based on predefined strata.
 
+        Strata given as a dictionary are concatenated once, and the positions of each stratum's members are
+        shuffled one by one; the dictionary itself is left untouched. Strata given as an array of stratum codes are
+        all assigned in a single vectorised pass: participants are sorted once on a 64-bit key packing the stratum
+        above random bits, and each participant's rank within its stratum gives its group. The participant list is
+        left untouched and the assignment is aligned to it.
+
         Args:
-            strata (dict): A dictionary with strata names as keys and lists of participants as values.
+            strata (dict or np.ndarray): A dictionary with strata names as keys and lists of participants as values,
+                or the stratum code of each participant, aligned to ``participants``.
 
         Returns:
-            dict: A dictionary with group names as keys and lists of assigned participants as values.
+            Assignment: The group code of each participant, viewable as a dictionary of participant lists per group.
         """
-        stratified_groups = dict((group, []) for group in self.groups)
-        for stratum, members in strata.items():
-            random.shuffle(members)
-            allocation = {group: members[i::len(self.groups)] for i, group in enumerate(self.groups)}
-            for group, members in allocation.items():
-                stratified_groups[group].extend(members)
-        return stratified_groups
+        if isinstance(strata, np.ndarray):
+            codes = self.batch_design('stratified', strata=strata).draw(self.rng, 1)[0]
+            return Assignment(self.participants, self.groups, codes)
+        members, starts, sizes = _concatenate_members(strata.values())
+        order = np.arange(len(members))
+        for start, size in zip(starts.tolist(), sizes.tolist()):
+            self.rng.shuffle(order[start:start + size])
+        codes = (np.arange(len(members)) - np.repeat(starts, sizes)) % len(self.groups)
+        return Assignment(members[order], self.groups, codes)
 
+    @timed
     def covariate_adaptive_randomization(self, covariates):
         """Performs covariate-adaptive randomization to balance covariates across groups.
 
         Args:
-            covariates (dict): A dictionary with participant identifiers as keys and covariate values as values.
+            covariates (dict or array-like): A dictionary with participant identifiers as keys and covariate values as
+                values, or the covariate values of each participant aligned to ``participants``.
 
         Returns:
-            dict: A dictionary with group names as keys and lists of assigned participants as values.
+            Assignment: The group code of each participant, viewable as a dictionary of participant lists per group.
         """
-        group_allocations = dict({group: [] for group in self.groups})
-        for participant in self.participants:
-            covariate_values = covariates[participant]
-            imbalance_scores = {group: np.sum([covariates[p] == covariate_values for p in group_allocations[group]]) for group in self.groups}
-            min_imbalance_group = min(imbalance_scores, key=imbalance_scores.get)
-            group_allocations[min_imbalance_group].append(participant)
-        return group_allocations
+        return self._count_table_allocation(covariates)
 
+    @timed
     def permuted_block_randomization(self, block_sizes):
         """Performs permuted block randomization using varying block sizes.
 
+        Participants are allocated in list order by following ``permuted_block_schedule``, so every participant is
+        assigned exactly once and all blocks but possibly the last are balanced.
+
         Args:
-            block_sizes (list): A list of block sizes to use for permutation.
+            block_sizes (list): A list of block sizes to choose from at random, each a multiple of the number of groups.
 
         Returns:
-            dict: A dictionary with group names as keys and lists of assigned participants as values.
+            Assignment: The group code of each participant, viewable as a dictionary of participant lists per group.
         """
-        blocks = []
-        for block_size in block_sizes:
-            blocks.extend([self.participants[i:i + block_size] for i in range(0, len(self.participants), block_size)])
-        randomized_blocks = []
-        for block in blocks:
-            random.shuffle(block)
-            randomized_blocks.extend(block)
-        return {group: randomized_blocks[i::len(self.groups)] for i, group in enumerate(self.groups)}
+        n_participants = len(self.participants)
+        codes = np.empty(n_participants, dtype=group_code_dtype(len(self.groups)))
+        position = 0
+        for block in self.permuted_block_schedule(block_sizes, n_allocations=n_participants):
+            codes[position:position + len(block)] = block[:n_participants - position]
+            position += len(block)
+        return Assignment(self.participants, self.groups, codes)
+
+    def permuted_block_schedule(self, block_sizes, n_allocations=None):
+        """Lazily generates a concealed permuted block allocation schedule of any length in constant memory.
+
+        Args:
+            block_sizes (list): A list of block sizes to choose from at random, each a multiple of the number of groups.
+            n_allocations (int, optional): Stop once the yielded blocks cover this many allocations; the last block is
+                yielded whole. Defaults to None, an endless schedule.
+
+        Returns:
+            generator: Yields one np.ndarray of group codes, indexing ``groups``, per block.
+        """
+        blocks = permuted_blocks(len(self.groups), block_sizes, self.rng)
+        if n_allocations is None:
+            return blocks
+        return self._take_blocks(blocks, n_allocations)
+
+    def export_schedule(self, path, block_sizes, n_allocations):
+        """Generates a permuted block schedule and stores it as a memory-mapped schedule file.
 
+        The header records the design, the seed and the state of the generator before the schedule was drawn, so
+        the schedule can be regenerated and audited. Open the file with ``schedule_files.ScheduleFile``.
+
+        Args:
+            path (str): The file to write.
+            block_sizes (list): A list of block sizes to choose from at random, each a multiple of the number of groups.
+            n_allocations (int): The number of allocations to store; the last block may be cut short.
+        """
+        rng_state = self.rng.bit_generator.state
+        write_schedule(path, self.groups, self.permuted_block_schedule(block_sizes, n_allocations), n_allocations,
+                       design={'type': 'permuted_block', 'block_sizes': list(block_sizes)},
+                       seed=seed_metadata(self.seed_sequence, self.bit_generator), rng_state=rng_state)
+
+    @staticmethod
+    def _take_blocks(blocks, n_allocations):
+        """Yields blocks until they cover at least ``n_allocations`` allocations."""
+        allocated = 0
+        while allocated < n_allocations:
+            block = next(blocks)
+            allocated += len(block)
+            yield block
+
+    @timed
     def cluster_randomization(self, clusters):
         """Performs cluster randomization where clusters of participants are randomized.
 
+        Clusters can be given in compressed sparse row (CSR) layout: the members of cluster ``c`` are the participants
+        at positions ``members[offsets[c]:offsets[c + 1]]``. The cluster group codes are then permuted as one array
+        and expanded to participants with a single ``np.repeat``, with no Python work per cluster, and the
+        assignment is aligned to ``participants``.
+
         Args:
-            clusters (dict): A dictionary with cluster names as keys and lists of participant identifiers as values.
+            clusters (dict or tuple): A dictionary with cluster names as keys and lists of participant identifiers as
+                values, or a CSR tuple ``(offsets, members)`` of integer arrays covering every participant once.
 
         Returns:
-            dict: A dictionary with group names as keys and lists of assigned clusters as values.
+            Assignment: The group code of each participant, with all members of a cluster sharing the cluster's group.
         """
-        cluster_list = list(clusters.keys())
-        random.shuffle(cluster_list)
-        cluster_allocation = {group: cluster_list[i::len(self.groups)] for i, group in enumerate(self.groups)}
-        participant_allocation = defaultdict(list)
-        for group, cluster_keys in cluster_allocation.items():
-            for cluster in cluster_keys:
-                participant_allocation[group].extend(clusters[cluster])
-        return dict(participant_allocation)
+        if isinstance(clusters, tuple):
+            offsets, members = _check_csr(clusters, len(self.participants))
+            cluster_codes = _cyclic_codes(len(offsets) - 1, len(self.groups))
+            self.rng.shuffle(cluster_codes)
+            codes = np.full(len(self.participants), -1, dtype=cluster_codes.dtype)
+            codes[members] = np.repeat(cluster_codes, np.diff(offsets))
+            if (codes < 0).any():
+                raise ValueError("The clusters must cover every participant exactly once")
+            return Assignment(self.participants, self.groups, codes)
+        members, starts, sizes = _concatenate_members(clusters.values())
+        cluster_order = np.arange(len(sizes))
+        self.rng.shuffle(cluster_order)
+        ordered_sizes = sizes[cluster_order]
+        shifts = starts[cluster_order] - (np.cumsum(ordered_sizes) - ordered_sizes)
+        sequence = np.arange(len(members)) + np.repeat(shifts, ordered_sizes)
+        codes = np.repeat(_cyclic_codes(len(cluster_order), len(self.groups)), ordered_sizes)
+        return Assignment(members[sequence], self.groups, codes)
 
+    @timed
     def minimization(self, covariates):
         """Performs minimization to balance predefined covariates across groups.
 
         Args:
-            covariates (dict): A dictionary with participant identifiers as keys and covariate values as values.
+            covariates (dict or array-like): A dictionary with participant identifiers as keys and covariate values as
+                values, or the covariate values of each participant aligned to ``participants``.
+
+        Returns:
+            Assignment: The group code of each participant, viewable as a dictionary of participant lists per group.
+        """
+        return self._count_table_allocation(covariates)
+
+    @timed
+    def pocock_simon_minimization(self, covariates, factor_weights=None, imbalance='range', p=1.0):
+        """Performs multi-factor Pocock-Simon minimization to balance the margins of several covariates across groups.
+
+        Each participant's covariate value is a sequence of factor levels, e.g. ``(site, sex, age_band)``. For every
+        arriving participant, each candidate group is scored by the weighted sum over factors of the imbalance that
+        assigning the participant there would create among the participants sharing its level of that factor. Counts
+        are kept in a groups x factors x levels tensor, so the per-arrival cost grows with the number of groups and
+        factors but not with the number of levels or participants.
+
+        Args:
+            covariates (dict or array-like): A dictionary with participant identifiers as keys and sequences of factor
+                levels as values, or an (n_participants, n_factors) array of factor levels aligned to ``participants``.
+            factor_weights (list, optional): A weight for each factor. Defaults to equal weights.
+            imbalance (str, optional): The imbalance metric, one of 'range', 'variance' or 'sd'. Defaults to 'range'.
+            p (float, optional): Probability of assigning the participant to the group with the lowest score; otherwise
+                one of the other groups is chosen at random. Ties are broken at random. Defaults to 1.0.
+
+        Returns:
+            Assignment: The group code of each participant, viewable as a dictionary of participant lists per group.
+        """
+        if imbalance not in IMBALANCE_METRICS:
+            raise ValueError(f"Unknown imbalance metric {imbalance!r}, expected one of {sorted(IMBALANCE_METRICS)}")
+        imbalance_metric = IMBALANCE_METRICS[imbalance]
+        level_codes = self._covariate_levels(covariates, factors=True)
+        n_groups, n_factors = len(self.groups), level_codes.shape[1]
+        weights = np.ones(n_factors) if factor_weights is None else np.asarray(factor_weights, dtype=float)
+        if weights.shape != (n_factors,):
+            raise ValueError(f"Expected {n_factors} factor weights, got {len(weights)}")
+        n_levels = int(level_codes.max(initial=0)) + 1
+        level_counts = np.zeros((n_groups, n_factors, n_levels), dtype=np.int64)
+
+        factor_index = np.arange(n_factors)
+        codes = np.empty(len(self.participants), dtype=group_code_dtype(n_groups))
+        for i, levels in enumerate(level_codes):
+            marginal_counts = level_counts[:, factor_index, levels]
+            group_index = _pocock_simon_code(marginal_counts, weights, imbalance_metric, p, self.rng)
+            level_counts[group_index, factor_index, levels] += 1
+            codes[i] = group_index
+        if self.metrics is not None:
+            self.metrics.increment('imbalance_evaluations', len(level_codes))
+        return Assignment(self.participants, self.groups, codes)
+
+    @timed
+    def rerandomization(self, covariates, threshold=None, acceptance_probability=None, max_candidates=10**6,
+                        max_bytes=2**28):
+        """Performs Morgan-Rubin rerandomization: redraws simple randomizations until the covariates are balanced.
+
+        Candidates are drawn like ``simple_randomization(vectorized=True)`` and the first whose Mahalanobis imbalance
+        sum_k n_k (m_k - m)' S^-1 (m_k - m) is at most the threshold is accepted. The covariates are centred and
+        whitened once, so that the imbalance of a candidate is the squared norm of its whitened group sums. A whole
+        batch of candidates is scored with one matrix product per group. The result does not depend on the batch
+        size: batches start at 1024 candidates and double up to the limit set by ``max_bytes``.
+
+        Args:
+            covariates (array-like): An (n_participants, n_covariates) numeric matrix aligned to ``participants``.
+            threshold (float, optional): The largest accepted Mahalanobis imbalance.
+            acceptance_probability (float, optional): Sets the threshold to the quantile of the imbalance's asymptotic
+                chi-square distribution, so that about this share of candidates is accepted. Give either this or
+                ``threshold``.
+            max_candidates (int, optional): The number of candidates to try before giving up. Defaults to 10^6.
+            max_bytes (int, optional): Approximate working memory allowed per batch of candidates. Defaults to 256 MiB.
+
+        Returns:
+            Assignment: The accepted group code of each participant, aligned to ``participants``.
+
+        Raises:
+            ValueError: If none of ``max_candidates`` candidates is accepted.
+        """
+        if (threshold is None) == (acceptance_probability is None):
+            raise ValueError("Give exactly one of threshold or acceptance_probability")
+        n_participants, n_groups = len(self.participants), len(self.groups)
+        covariates = np.asarray(covariates, dtype=np.float64).reshape(n_participants, -1)
+        moments = group_moments(np.zeros(n_participants, dtype=np.int8), covariates, 1, max_bytes)
+        whitened = (covariates - moments['mean']) @ whitening(moments['covariance'])
+        if threshold is None:
+            threshold = chi2_isf(1 - acceptance_probability, max(1, whitened.shape[1] * (n_groups - 1)))
+
+        batch_design = self.batch_design('simple')
+        group_sizes = np.maximum(np.bincount(batch_design.pattern, minlength=n_groups), 1)
+        rows_per_chunk = max(1, max_bytes // max(1, n_participants * (1 + whitened.itemsize)))
+        start, n_rows = 0, min(1024, rows_per_chunk)
+        while start < max_candidates:
+            candidates = batch_design.draw(self.rng, min(n_rows, max_candidates - start))
+            start, n_rows = start + len(candidates), min(2 * n_rows, rows_per_chunk)
+            scores = np.zeros(len(candidates))
+            last_group_sums = np.zeros((len(candidates), whitened.shape[1]))
+            for code in range(n_groups - 1):
+                group_sums = (candidates == code).astype(whitened.dtype) @ whitened
+                last_group_sums -= group_sums
+                scores += np.einsum('ij,ij->i', group_sums, group_sums) / group_sizes[code]
+            scores += np.einsum('ij,ij->i', last_group_sums, last_group_sums) / group_sizes[-1]
+            accepted = np.flatnonzero(scores <= threshold)
+            n_scored = len(candidates) if len(accepted) == 0 else accepted[0] + 1
+            if self.metrics is not None:
+                self.metrics.increment('imbalance_evaluations', int(n_scored))
+                self.metrics.increment('rerandomization_candidates', int(n_scored))
+            if len(accepted):
+                return Assignment(self.participants, self.groups, candidates[accepted[0]])
+        raise ValueError(f"No candidate among {max_candidates} had an imbalance of at most {threshold:.4g}; "
+                         "raise max_candidates or the threshold")
+
+    def _covariate_levels(self, covariates, factors=False):
+        """Interns covariate values as integer levels aligned to ``participants``.
+
+        A dictionary is read once, in roster order, and its values are interned in one pass; an array aligned to
+        ``participants`` is interned with ``np.unique`` without any Python work per participant. Level numbers only
+        identify equal values, so their order carries no meaning.
+
+        Args:
+            covariates (dict or array-like): A dictionary with participant identifiers as keys and covariate values
+                as values, or the covariate values of each participant aligned to ``participants``.
+            factors (bool, optional): Whether each value is a sequence of factor levels, interned factor by factor,
+                rather than a single value. Defaults to False.
+
+        Returns:
+            np.ndarray: An (n_participants, n_factors) array of levels, with one column for single values.
+        """
+        n_participants = len(self.participants)
+        if not isinstance(covariates, dict):
+            values = np.asarray(covariates)
+            if len(values) != n_participants:
+                raise ValueError(f"Expected covariates for {n_participants} participants, got {len(values)}")
+            values = values.reshape(n_participants, -1)
+            if not factors and values.shape[1] > 1:
+                return np.unique(values, axis=0, return_inverse=True)[1].reshape(n_participants, 1)
+            return np.stack([np.unique(column, return_inverse=True)[1].reshape(-1) for column in values.T], axis=1)
+
+        values = list(map(covariates.__getitem__, self.participants))
+        if factors:
+            n_factors = len(values[0]) if values else 0
+            if any(len(levels) != n_factors for levels in values):
+                raise ValueError(f"Every participant must have {n_factors} factor levels")
+            columns = list(zip(*values)) if n_factors else []
+        else:
+            n_factors, columns = 1, [values]
+        levels = np.empty((n_participants, n_factors), dtype=np.intp)
+        for factor, column in enumerate(columns):
+            level_ids = {}
+            try:
+                levels[:, factor] = [level_ids.setdefault(level, len(level_ids)) for level in column]
+            except TypeError:
+                level_ids = {}
+                levels[:, factor] = [level_ids.setdefault(_hashable_level(level), len(level_ids)) for level in column]
+        return levels
+
+    def _count_table_allocation(self, covariates):
+        """Assigns each participant to the group holding the fewest members with the same covariate value.
+
+        Ties are broken in favour of the group listed first in ``self.groups``, so the participants sharing a value
+        fill the groups in turn: each gets the code of its rank among them, modulo the number of groups. The ranks
+        come from one stable sort of the interned levels, so no Python work is done per participant once the
+        covariates are interned.
+
+        Args:
+            covariates (dict or array-like): A dictionary with participant identifiers as keys and covariate values as
+                values, or the covariate values of each participant aligned to ``participants``. Values must be
+                hashable or lists; equal lists count as the same value.
+
+        Returns:
+            Assignment: The group code of each participant, viewable as a dictionary of participant lists per group.
+        """
+        levels = self._covariate_levels(covariates)[:, 0]
+        order = np.argsort(levels, kind='stable')
+        level_sizes = np.bincount(levels)
+        ranks = np.empty(len(levels), dtype=np.intp)
+        ranks[order] = np.arange(len(levels)) - np.repeat(np.cumsum(level_sizes) - level_sizes, level_sizes)
+        codes = (ranks % len(self.groups)).astype(group_code_dtype(len(self.groups)))
+        if self.metrics is not None:
+            self.metrics.increment('imbalance_evaluations', len(levels))
+        return Assignment(self.participants, self.groups, codes)
+
+    def iter_assignment_matrix(self, design, n_draws, max_bytes=2**28, block_size=None, strata=None, clusters=None):
+        """Draws many alternative assignments of the participants under the same design, in memory-bounded chunks.
+
+        Every assignment is drawn the way the corresponding method allocates participants, but all draws in a chunk
+        are generated by a few vectorised calls instead of a Python loop. Column ``j`` of every chunk is the group
+        code of ``participants[j]``, and the rows do not depend on ``max_bytes``.
+
+        Args:
+            design (str): One of 'simple', 'block', 'stratified' or 'cluster'.
+            n_draws (int): The total number of assignments to draw.
+            max_bytes (int, optional): Approximate working memory allowed per chunk. Defaults to 256 MiB.
+            block_size (int, optional): The block size of the 'block' design.
+            strata (dict or np.ndarray, optional): The strata of the 'stratified' design, as a dictionary with strata
+                names as keys and lists of participants as values, or as a stratum label per participant.
+            clusters (dict, tuple or np.ndarray, optional): The clusters of the 'cluster' design, as a dictionary with
+                cluster names as keys and lists of participants as values, as a CSR tuple ``(offsets, members)`` of
+                participant positions, or as a cluster label per participant.
+
+        Yields:
+            np.ndarray: An (rows, n_participants) array of group codes; the chunks together hold ``n_draws`` rows.
+        """
+        batch_design = self.batch_design(design, block_size=block_size, strata=strata, clusters=clusters)
+        rows_per_chunk = batch_design.rows_per_chunk(max_bytes)
+        for start in range(0, n_draws, rows_per_chunk):
+            yield batch_design.draw(self.rng, min(rows_per_chunk, n_draws - start))
+
+    def assignment_matrix(self, design, n_draws, max_bytes=2**28, block_size=None, strata=None, clusters=None):
+        """Draws an (n_draws, n_participants) matrix of alternative assignments under the same design.
+
+        See ``iter_assignment_matrix`` for the arguments; this concatenates its chunks.
+
+        Returns:
+            np.ndarray: An (n_draws, n_participants) array of group codes.
+        """
+        chunks = list(self.iter_assignment_matrix(design, n_draws, max_bytes, block_size, strata, clusters))
+        if not chunks:
+            return np.empty((0, len(self.participants)), dtype=group_code_dtype(len(self.groups)))
+        return np.concatenate(chunks)
+
+    def assignment_count(self, design, block_size=None, strata=None, clusters=None):
+        """Counts the distinct assignments a design can produce; under the design they are all equally likely.
+
+        See ``iter_assignment_matrix`` for the arguments.
+
+        Returns:
+            int: The number of distinct assignments.
+        """
+        return self.batch_design(design, block_size=block_size, strata=strata, clusters=clusters).count()
+
+    def iter_all_assignments(self, design, max_bytes=2**28, block_size=None, strata=None, clusters=None):
+        """Enumerates every distinct assignment a design can produce, in memory-bounded chunks.
+
+        The number of assignments grows combinatorially, so check ``assignment_count`` first. See
+        ``iter_assignment_matrix`` for the arguments.
+
+        Yields:
+            np.ndarray: An (rows, n_participants) array of group codes; each assignment appears in exactly one row.
+        """
+        batch_design = self.batch_design(design, block_size=block_size, strata=strata, clusters=clusters)
+        yield from batch_design.enumerate(batch_design.rows_per_chunk(max_bytes))
+
+    def batch_design(self, design, block_size=None, strata=None, clusters=None):
+        """Compiles one of the designs into a ``BatchDesign`` over ``participants``.
+
+        The compiled design only holds integer arrays, so it is cheap to pickle and can draw assignments in other
+        processes, e.g. through ``ParallelExecutor``. See ``iter_assignment_matrix`` for the arguments.
+
+        Returns:
+            BatchDesign: The compiled design; column ``j`` of its draws is the group code of ``participants[j]``.
+        """
+        n_participants, n_groups = len(self.participants), len(self.groups)
+        if design == 'simple':
+            return BatchDesign(_cyclic_codes(n_participants, n_groups))
+        if design == 'block':
+            return BatchDesign(_cyclic_codes(n_participants, n_groups), segments=np.arange(n_participants) // block_size)
+        if design == 'stratified':
+            labels, n_strata = self._participant_labels(strata)
+            stratum_sizes = np.bincount(labels, minlength=n_strata)
+            stratum_starts = np.cumsum(stratum_sizes) - stratum_sizes
+            pattern = (np.arange(n_participants) - np.repeat(stratum_starts, stratum_sizes)) % n_groups
+            return BatchDesign(pattern.astype(group_code_dtype(n_groups)), segments=labels)
+        if design == 'cluster':
+            labels, n_clusters = self._participant_labels(clusters)
+            return BatchDesign(_cyclic_codes(n_clusters, n_groups), clusters=labels)
+        raise ValueError(f"Unknown design {design!r}, expected 'simple', 'block', 'stratified' or 'cluster'")
+
+    def _participant_labels(self, partition):
+        """Converts strata or clusters into a dense integer label per participant.
+
+        Args:
+            partition (dict, tuple or np.ndarray): A dictionary with labels as keys and lists of participants as values,
+                a CSR tuple ``(offsets, members)`` of the participant positions holding each label, or a label per
+                participant aligned to ``participants``.
 
         Returns:
-            dict: A dictionary with group names as keys and lists of assigned participants as values.
+            tuple: The label of each participant as integers 0..k-1, and the number of labels k. Integer labels
+                already below the number of participants are kept as they are, so some of 0..k-1 may be unused;
+                larger or sparse labels are renumbered in sorted order.
         """
-        group_allocations = {group: [] for group in self.groups}
-        for participant in self.participants:
-            covariate_values = covariates[participant]
-            imbalance_scores = {group: np.sum([covariates[p] == covariate_values for p in group_allocations[group]]) for group in self.groups}
-            min_imbalance_group = min(imbalance_scores, key=imbalance_scores.get)
-            group_allocations[min_imbalance_group].append(participant)
-        return group_allocations
+        if isinstance(partition, dict):
+            index = self.index
+            labels = np.full(len(index), -1, dtype=np.intp)
+            for label, members in enumerate(partition.values()):
+                labels[index.positions(members)] = label
+            if (labels < 0).any():
+                raise ValueError("Every participant must belong to one stratum or cluster")
+            return labels, len(partition)
+        if isinstance(partition, tuple):
+            offsets, members = _check_csr(partition, len(self.participants))
+            labels = np.full(len(self.participants), -1, dtype=np.intp)
+            labels[members] = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+            if (labels < 0).any():
+                raise ValueError("Every participant must belong to one stratum or cluster")
+            return labels, len(offsets) - 1
+        partition = np.asarray(partition)
+        if partition.shape != (len(self.participants),):
+            raise ValueError(f"Expected {len(self.participants)} labels, got {len(partition)}")
+        if partition.dtype.kind in 'iu' and len(partition) and 0 <= partition.min() and partition.max() < len(partition):
+            return partition, int(partition.max()) + 1
+        unique_labels, labels = np.unique(partition, return_inverse=True)
+        return labels, len(unique_labels)
+
+    def hash_assign(self, participant, salt='', experiment='', weights=None):
+        """Deterministically assigns one participant by hashing its identifier, without any stored state.
+
+        The identifier is hashed together with the salt and experiment name (64-bit FNV-1a followed by the
+        SplitMix64 finalizer), the hash is mapped to a uniform number in [0, 1), and the number selects a group
+        with probability proportional to its weight. The same inputs always give the same group, on any machine,
+        and ``hash_randomization`` gives identical answers in bulk.
+
+        Args:
+            participant (str, bytes or int): The participant identifier.
+            salt (str, optional): A secret salt that makes assignments unpredictable. Defaults to ''.
+            experiment (str, optional): The experiment name, so that experiments are assigned independently. Defaults to ''.
+            weights (list, optional): The allocation weight of each group. Defaults to equal weights.
+
+        Returns:
+            str: The name of the group the participant is assigned to.
+        """
+        uniform = (_mix64(_fnv1a(_id_bytes(participant), self._hash_prefix(salt, experiment))) >> 11) / 2**53
+        cumulative_weights = self._cumulative_weights(weights)
+        return self.groups[min(bisect.bisect_right(cumulative_weights, uniform), len(self.groups) - 1)]
+
+    @timed
+    def hash_randomization(self, salt='', experiment='', weights=None, participants=None):
+        """Deterministically assigns a batch of participants by hashing their identifiers.
+
+        Vectorised counterpart of ``hash_assign``: identifiers are hashed one byte column at a time across the
+        whole batch. Bytes, integers and ASCII strings are converted to bytes by NumPy casts, so they are assigned
+        without Python work per participant. Only strings with non-ASCII characters are encoded to UTF-8 one by one.
+
+        Args:
+            salt (str, optional): A secret salt that makes assignments unpredictable. Defaults to ''.
+            experiment (str, optional): The experiment name, so that experiments are assigned independently. Defaults to ''.
+            weights (list, optional): The allocation weight of each group. Defaults to equal weights.
+            participants (list or np.ndarray, optional): The identifiers to assign, as strings, bytes or integers.
+                Defaults to ``participants``.
+
+        Returns:
+            Assignment: The group code of each participant, aligned to the identifiers given.
+        """
+        participants = self.participants if participants is None else participants
+        ids = _utf8_array(np.asarray(participants))
+        hashes = _fnv1a_array(ids, self._hash_prefix(salt, experiment))
+        uniforms = (hashes >> np.uint64(11)).astype(np.float64) * 2.0**-53
+        codes = np.minimum(np.searchsorted(np.array(self._cumulative_weights(weights)), uniforms, side='right'),
+                           len(self.groups) - 1)
+        return Assignment(participants, self.groups, codes)
+
+    @staticmethod
+    def _hash_prefix(salt, experiment):
+        """Returns the FNV-1a state after hashing the salt and experiment name."""
+        return _fnv1a(salt.encode('utf-8') + b'\x00' + experiment.encode('utf-8') + b'\x00')
+
+    def _cumulative_weights(self, weights):
+        """Returns the cumulative allocation probabilities of the groups, computed without NumPy."""
+        weights = [1.0] * len(self.groups) if weights is None else [float(weight) for weight in weights]
+        if len(weights) != len(self.groups) or min(weights, default=0) < 0 or sum(weights) <= 0:
+            raise ValueError(f"Expected {len(self.groups)} non-negative weights with a positive sum")
+        total = sum(weights)
+        return [cumulative / total for cumulative in itertools.accumulate(weights)]
 
     def randomization_check(self, groups):
-        """Checks and prints the sizes of the groups after randomization.
+        """Checks the sizes of the groups after randomization.
+
+        The sizes are logged at INFO level and, on instrumented instances, observed as 'group_size.<group>' gauges.
+        See ``balance_report`` to check the balance of covariates as well.
 
         Args:
-            groups (dict): A dictionary with group names as keys and lists of assigned participants as values.
+            groups (Assignment or dict): An assignment, or a dictionary with group names as keys and lists of
+                assigned participants as values.
 
         Returns:
             dict: A dictionary with group names as keys and the count of participants in each group as values.
         """
-        group_sizes = {group: len(members) for group, members in groups.items()}
-        print(f"Group sizes: {group_sizes}")
+        if isinstance(groups, Assignment):
+            group_sizes = groups.group_sizes()
+        else:
+            group_sizes = {group: len(members) for group, members in groups.items()}
+        logging.getLogger(__name__).info("Group sizes: %s", group_sizes)
+        if self.metrics is not None:
+            for group, size in group_sizes.items():
+                self.metrics.observe(f'group_size.{group}', size)
         return group_sizes
 
+    def balance_report(self, groups, covariates=None, categorical=None, reference=None, max_bytes=2**28):
+        """Summarizes how well an assignment balances covariates across groups.
+
+        The largest absolute standardized mean difference and the Mahalanobis p-value are logged at INFO level and,
+        on instrumented instances, observed as 'max_abs_smd' and 'mahalanobis_p_value' gauges.
+
+        Args:
+            groups (Assignment or dict): An assignment, or a dictionary with group names as keys and lists of
+                assigned participants as values.
+            covariates (array-like, optional): An (n_participants, n_covariates) numeric matrix aligned to
+                ``participants``.
+            categorical (array-like, optional): An (n_participants, n_categorical) array of category labels aligned to
+                ``participants``.
+            reference (str, optional): The group that differences are measured against. Defaults to the first group.
+            max_bytes (int, optional): Approximate working memory allowed per chunk. Defaults to 256 MiB.
+
+        Returns:
+            dict: The report of ``diagnostics.balance_report``, with arrays indexed by the codes of ``groups``.
+        """
+        if isinstance(groups, Assignment):
+            codes = groups.codes_for(self.participants)
+        else:
+            index = self.index
+            codes = np.full(len(index), -1, dtype=group_code_dtype(len(self.groups)))
+            for code, group in enumerate(self.groups):
+                codes[index.positions(groups[group])] = code
+            if (codes < 0).any():
+                raise ValueError("Every participant must be assigned to a group")
+        reference = 0 if reference is None else self.groups.index(reference)
+        report = balance_report(codes, covariates, categorical, len(self.groups), reference, max_bytes)
+        if covariates is not None:
+            logging.getLogger(__name__).info("Max |SMD| %.4f, Mahalanobis p-value %.4f", report['max_abs_smd'],
+                                             report['mahalanobis']['p_value'])
+            if self.metrics is not None:
+                self.metrics.observe('max_abs_smd', report['max_abs_smd'])
+                self.metrics.observe('mahalanobis_p_value', report['mahalanobis']['p_value'])
+        return report
+
 # Example Usage
 if __name__ == "__main__":
     participants = ['P1', 'P2', 'P3', 'P4', 'P5', 'P6', 'P7', 'P8']
@@ -184,11 +1028,11 @@ if __name__ == "__main__":
 
     # Simple randomization
     simple_groups = randomizer.simple_randomization()
-    print("Simple Randomization:", simple_groups)
+    print("Simple Randomization:", simple_groups.to_dict())
 
     # Block randomization with block size 4
     block_groups = randomizer.block_randomization(block_size=4)
-    print("Block Randomization:", block_groups)
+    print("Block Randomization:", block_groups.to_dict())
 
     # Stratified randomization
     strata = {
@@ -196,7 +1040,7 @@ if __name__ == "__main__":
         'old': ['P5', 'P6', 'P7', 'P8']
     }
     stratified_groups = randomizer.stratified_randomization(strata)
-    print("Stratified Randomization:", stratified_groups)
+    print("Stratified Randomization:", stratified_groups.to_dict())
 
     # Covariate-adaptive randomization
     covariates = {
@@ -204,11 +1048,11 @@ if __name__ == "__main__":
         'P5': 'A', 'P6': 'B', 'P7': 'A', 'P8': 'B'
     }
     covariate_groups = randomizer.covariate_adaptive_randomization(covariates)
-    print("Covariate-Adaptive Randomization:", covariate_groups)
+    print("Covariate-Adaptive Randomization:", covariate_groups.to_dict())
 
     # Permuted block randomization with varying block sizes
     permuted_block_groups = randomizer.permuted_block_randomization(block_sizes=[2, 4])
-    print("Permuted Block Randomization:", permuted_block_groups)
+    print("Permuted Block Randomization:", permuted_block_groups.to_dict())
 
     # Cluster randomization
     clusters = {
@@ -218,7 +1062,7 @@ if __name__ == "__main__":
         'cluster4': ['P7', 'P8']
     }
     cluster_groups = randomizer.cluster_randomization(clusters)
-    print("Cluster Randomization:", cluster_groups)
+    print("Cluster Randomization:", cluster_groups.to_dict())
 
     # Minimization
     covariates_minimization = {
@@ -226,7 +1070,20 @@ if __name__ == "__main__":
         'P5': 'A', 'P6': 'B', 'P7': 'A', 'P8': 'B'
     }
     minimized_groups = randomizer.minimization(covariates_minimization)
-    print("Minimization:", minimized_groups)
+    print("Minimization:", minimized_groups.to_dict())
+
+    # Rerandomization balancing a numeric covariate (age)
+    covariate_matrix = [[34], [61], [45], [29], [52], [38], [70], [41]]
+    rerandomized_groups = randomizer.rerandomization(covariate_matrix, acceptance_probability=0.1)
+    print("Rerandomization:", rerandomized_groups.to_dict())
+
+    # Multi-factor Pocock-Simon minimization on (sex, age band)
+    factor_covariates = {
+        'P1': ('F', 'young'), 'P2': ('M', 'young'), 'P3': ('F', 'old'), 'P4': ('M', 'old'),
+        'P5': ('F', 'young'), 'P6': ('M', 'old'), 'P7': ('F', 'old'), 'P8': ('M', 'young')
+    }
+    pocock_simon_groups = randomizer.pocock_simon_minimization(factor_covariates, factor_weights=[2, 1])
+    print("Pocock-Simon Minimization:", pocock_simon_groups.to_dict())
 
     # Check randomization balance
-    randomizer.randomization_check(simple_groups)
+    print("Group sizes:", randomizer.randomization_check(simple_groups))
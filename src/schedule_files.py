@@ -0,0 +1,177 @@
+"""
+A module for storing allocation schedules in memory-mapped binary files.
+
+A master allocation list is generated once and then read by many enrollment processes. The file starts with a fixed
+prefix (magic bytes, format version and header length), followed by a JSON header describing the groups, the design,
+the seed and the random number generator state. The header is padded to a 64-byte boundary and followed by the group
+codes as a fixed-width integer array. Readers map the array with ``np.memmap``, so opening a 10^8-row schedule
+parses only the header. The pages are loaded on demand and shared by every process that maps the file.
+
+Typical usage example:
+
+  randomizer.export_schedule('schedule.bin', block_sizes=[2, 4], n_allocations=10**6)
+  schedule = ScheduleFile('schedule.bin')
+  schedule.allocation(41)      # 'Treatment'
+  schedule.codes[:10]          # read-only np.memmap of group codes
+"""
+
+import json
+import os
+import struct
+import uuid
+
+from .assignments import group_code_dtype
+from .lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+MAGIC = b'CAUSCHED'
+VERSION = 1
+_PREFIX = struct.Struct('<8sII')
+_ALIGNMENT = 64
+
+def _data_offset(header_length):
+    """Returns the offset of the code array, the end of the header rounded up to the alignment."""
+    return -(-(_PREFIX.size + header_length) // _ALIGNMENT) * _ALIGNMENT
+
+def _json_safe(value):
+    """Converts NumPy arrays and scalars nested in dictionaries and lists to JSON-serializable values."""
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def seed_metadata(seed_sequence, bit_generator=None):
+    """Describes a SeedSequence so that it can be rebuilt from a schedule header.
+
+    Args:
+        seed_sequence (np.random.SeedSequence): The seed sequence.
+        bit_generator (str, optional): The name of the bit generator it seeds. Defaults to None.
+
+    Returns:
+        dict: The 'entropy' and 'spawn_key' of the sequence, and the 'bit_generator' if given.
+    """
+    metadata = {'entropy': _json_safe(seed_sequence.entropy), 'spawn_key': list(_json_safe(seed_sequence.spawn_key))}
+    if bit_generator is not None:
+        metadata['bit_generator'] = bit_generator
+    return metadata
+
+def write_schedule(path, groups, chunks, n_allocations, design, seed=None, rng_state=None, buffer_size=2**20):
+    """Writes a schedule file, streaming the group codes into the mapped array.
+
+    The file is written under a temporary name in the same directory, flushed to disk and then renamed onto ``path``,
+    so ``path`` either keeps its previous content or holds the complete schedule, even if writing fails or the
+    process crashes part way through.
+
+    Args:
+        path (str): The file to write.
+        groups (list): List of group names; code ``k`` refers to ``groups[k]``.
+        chunks (iterable): Arrays of consecutive group codes, e.g. blocks or ranges of a schedule. Codes past
+            ``n_allocations`` are dropped.
+        n_allocations (int): The number of allocations to store.
+        design (dict): A description of the design, e.g. ``{'type': 'permuted_block', 'block_sizes': [2, 4]}``.
+        seed (dict, optional): The seed, as returned by ``seed_metadata``. Defaults to None.
+        rng_state (dict, optional): The random number generator state the schedule was generated from. Defaults to None.
+        buffer_size (int, optional): Small chunks are gathered into writes of about this many codes. Defaults to 2^20.
+
+    Raises:
+        ValueError: If the chunks hold fewer than ``n_allocations`` codes.
+    """
+    dtype = group_code_dtype(len(groups))
+    header = json.dumps({'groups': list(groups), 'dtype': dtype.str, 'n_allocations': n_allocations,
+                         'design': _json_safe(design), 'seed': seed, 'rng_state': _json_safe(rng_state)}).encode('utf-8')
+    offset = _data_offset(len(header))
+    temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporary_path, 'xb') as file:
+            file.write(_PREFIX.pack(MAGIC, VERSION, len(header)) + header)
+            file.write(b' ' * (offset - _PREFIX.size - len(header)))
+            file.truncate(offset + n_allocations * dtype.itemsize)
+        if n_allocations:
+            _write_codes(temporary_path, dtype, offset, chunks, n_allocations, buffer_size)
+        with open(temporary_path, 'rb+') as file:
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+def _write_codes(path, dtype, offset, chunks, n_allocations, buffer_size):
+    """Streams the group codes into the mapped array of a schedule file whose header is already written."""
+    codes = np.memmap(path, dtype=dtype, mode='r+', offset=offset, shape=(n_allocations,))
+    position, pending, n_pending = 0, [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        n_pending += len(chunk)
+        if n_pending >= buffer_size or position + n_pending >= n_allocations:
+            buffer = np.concatenate(pending)[:n_allocations - position]
+            codes[position:position + len(buffer)] = buffer
+            position, pending, n_pending = position + len(buffer), [], 0
+            if position == n_allocations:
+                break
+    if pending and position < n_allocations:
+        buffer = np.concatenate(pending)
+        codes[position:position + len(buffer)] = buffer
+        position += len(buffer)
+    codes.flush()
+    del codes
+    if position < n_allocations:
+        raise ValueError(f"Expected {n_allocations} allocations, the schedule only had {position}")
+
+class ScheduleFile():
+    def __init__(self, path):
+        """Opens a schedule file written by ``write_schedule`` without reading its codes.
+
+        Args:
+            path (str): The schedule file.
+
+        Raises:
+            ValueError: If the file is not a schedule file or has an unsupported version.
+        """
+        with open(path, 'rb') as file:
+            prefix = file.read(_PREFIX.size)
+            if len(prefix) != _PREFIX.size or prefix[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path!r} is not a schedule file")
+            _, version, header_length = _PREFIX.unpack(prefix)
+            if version != VERSION:
+                raise ValueError(f"Unsupported schedule file version {version}, expected {VERSION}")
+            self.header = json.loads(file.read(header_length).decode('utf-8'))
+        self.path = path
+        self.groups = self.header['groups']
+        self.design = self.header['design']
+        self.rng_state = self.header['rng_state']
+        dtype = np.dtype(self.header['dtype'])
+        n_allocations = self.header['n_allocations']
+        if n_allocations == 0:
+            self.codes = np.empty(0, dtype=dtype)
+        else:
+            self.codes = np.memmap(path, dtype=dtype, mode='r', offset=_data_offset(header_length),
+                                   shape=(n_allocations,))
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def seed_sequence(self):
+        """np.random.SeedSequence: The seed sequence the schedule was generated from, or None if it was not stored."""
+        seed = self.header['seed']
+        if seed is None:
+            return None
+        return np.random.SeedSequence(seed['entropy'], spawn_key=seed['spawn_key'])
+
+    def allocation(self, index):
+        """Returns the group of one allocation.
+
+        Args:
+            index (int): The index of the allocation.
+
+        Returns:
+            str: The name of the allocated group.
+        """
+        return self.groups[int(self.codes[index])]
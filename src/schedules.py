@@ -0,0 +1,185 @@
+"""
+A module for allocation schedules whose k-th allocation can be computed directly, without generating the ones before it.
+
+``Randomizations.permuted_block_schedule`` draws blocks from a sequential generator, so allocation k depends on every
+random number drawn before it. A CounterSchedule instead derives every random number from a counter: the random bits
+for counter c of a stream are ``SplitMix64(key + c * golden_gamma)``, a pure function of the seed and c in the spirit
+of counter-based generators such as Philox. Any range of the schedule can therefore be produced on its own, so the
+shards of a multi-site schedule can be generated independently and in parallel and are identical to the same rows of
+a single-process run.
+
+For permuted block designs the schedule is cut into frames of ``frame_size`` allocations, and the block sizes of each
+frame come from that frame's counters. Producing allocation k only needs the frame containing it. Blocks never
+straddle frames; apart from that, sizes are drawn uniformly from ``block_sizes``, and each block is a random
+permutation of balanced group codes.
+
+Typical usage example:
+
+  schedule = CounterSchedule(['Treatment', 'Control'], block_sizes=[2, 4], seed=42)
+  schedule.allocation(1_000_000)              # 'Control', without generating the first million allocations
+  codes = schedule.codes(5000, 6000)          # group codes of allocations 5000..5999
+  site_codes = schedule.shard(3, n_shards=8, n_allocations=10**8)
+  schedule.export('schedule.bin', n_allocations=10**8)
+"""
+
+import math
+
+from .assignments import group_code_dtype
+from .lazy_imports import lazy_import
+from .randomizations import _check_block_sizes, _mix64_array
+from .schedule_files import seed_metadata, write_schedule
+
+np = lazy_import('numpy')
+
+_GOLDEN_GAMMA = 0x9e3779b97f4a7c15
+
+def _counter_bits(key, counters):
+    """Returns 64 random bits for each counter of the stream ``key``, as SplitMix64 would at those positions."""
+    return _mix64_array(np.uint64(key) + counters.astype(np.uint64) * np.uint64(_GOLDEN_GAMMA))
+
+def _counter_uniforms(key, counters):
+    """Returns a uniform number in [0, 1) for each counter of the stream ``key``."""
+    return (_counter_bits(key, counters) >> np.uint64(11)).astype(np.float64) * 2.0**-53
+
+class CounterSchedule():
+    def __init__(self, groups, block_sizes=None, seed=None, frame_size=None):
+        """Initializes a random-access allocation schedule.
+
+        Args:
+            groups (list): List of group names for randomization.
+            block_sizes (list, optional): The block sizes to choose from at random, each a multiple of the number of
+                groups. Defaults to None, which allocates every participant independently and uniformly at random.
+            seed (int or np.random.SeedSequence, optional): The seed. The schedule is a pure function of the seed, the
+                groups and the design. Defaults to None, fresh entropy from the OS.
+            frame_size (int, optional): The number of allocations per frame. Every frame must be fillable with whole
+                blocks. Defaults to the least common multiple of the block sizes, scaled up to at least 256.
+        """
+        self.groups = list(groups)
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self._frame_key, self._position_key = (int(key) for key in self.seed_sequence.generate_state(2, np.uint64))
+        self.dtype = group_code_dtype(len(self.groups))
+        self.block_sizes = None if block_sizes is None else list(block_sizes)
+        self.frame_size = None
+        if self.block_sizes is None:
+            return
+        _check_block_sizes(len(self.groups), self.block_sizes)
+        if frame_size is None:
+            lcm = math.lcm(*self.block_sizes)
+            frame_size = lcm * max(1, -(-256 // lcm))
+        self.frame_size = frame_size
+        self._sizes = np.array(self.block_sizes, dtype=np.int64)
+        self._fillable = np.zeros(frame_size + 1, dtype=bool)
+        self._fillable[0] = True
+        for remaining in range(1, frame_size + 1):
+            self._fillable[remaining] = any(self._fillable[remaining - size] for size in self.block_sizes
+                                            if size <= remaining)
+        if not self._fillable[frame_size]:
+            raise ValueError(f"A frame of {frame_size} allocations cannot be filled with blocks of sizes {self.block_sizes}")
+        self._max_blocks = frame_size // min(self.block_sizes)
+
+    def _frame_blocks(self, frames):
+        """Draws the block sizes of each frame, choosing every block among the sizes that leave the frame fillable.
+
+        Args:
+            frames (np.ndarray): Frame indices.
+
+        Returns:
+            np.ndarray: A (frames, max blocks per frame) array of block sizes in frame order, padded with zeros.
+        """
+        remaining = np.full(len(frames), self.frame_size, dtype=np.int64)
+        blocks = np.zeros((len(frames), self._max_blocks), dtype=np.int64)
+        for step in range(self._max_blocks):
+            active = remaining > 0
+            if not active.any():
+                break
+            leftover = remaining[:, None] - self._sizes
+            fits = (leftover >= 0) & self._fillable[np.maximum(leftover, 0)]
+            n_fits = fits.sum(axis=1)
+            choice = (_counter_uniforms(self._frame_key, frames * self._max_blocks + step) * n_fits).astype(np.int64)
+            size = self._sizes[np.argmax(np.cumsum(fits, axis=1) > choice[:, None], axis=1)]
+            blocks[:, step] = np.where(active, size, 0)
+            remaining -= blocks[:, step]
+        return blocks
+
+    def codes(self, start, stop):
+        """Computes the group codes of a range of allocations.
+
+        The work is proportional to ``stop - start`` plus one frame, whatever ``start`` is.
+
+        Args:
+            start (int): The index of the first allocation.
+            stop (int): The index after the last allocation.
+
+        Returns:
+            np.ndarray: The group code of allocations ``start`` to ``stop - 1``, indexing ``groups``.
+        """
+        if not 0 <= start <= stop:
+            raise ValueError(f"Expected 0 <= start <= stop, got start={start} and stop={stop}")
+        n_groups = len(self.groups)
+        if self.block_sizes is None:
+            uniforms = _counter_uniforms(self._position_key, np.arange(start, stop, dtype=np.uint64))
+            return np.minimum(uniforms * n_groups, n_groups - 1).astype(self.dtype)
+        if start == stop:
+            return np.empty(0, dtype=self.dtype)
+
+        frame_size = self.frame_size
+        first_frame, last_frame = start // frame_size, (stop - 1) // frame_size + 1
+        frames = np.arange(first_frame, last_frame, dtype=np.int64)
+        blocks = self._frame_blocks(frames)
+        labels = np.repeat(np.tile(np.arange(self._max_blocks), len(frames)), blocks.ravel()).reshape(len(frames), -1)
+        block_starts = np.cumsum(blocks, axis=1) - blocks
+        pattern = (np.arange(frame_size) - np.take_along_axis(block_starts, labels, axis=1)) % n_groups
+
+        random_bits = 64 - self._max_blocks.bit_length()
+        positions = (frames[:, None] * frame_size + np.arange(frame_size)).astype(np.uint64)
+        keys = _counter_bits(self._position_key, positions) >> np.uint64(64 - random_bits)
+        keys |= labels.astype(np.uint64) << np.uint64(random_bits)
+        codes = np.empty(keys.shape, dtype=self.dtype)
+        np.put_along_axis(codes, np.argsort(keys, axis=1), pattern.astype(self.dtype), axis=1)
+        offset = first_frame * frame_size
+        return codes.ravel()[start - offset:stop - offset]
+
+    def allocation(self, index):
+        """Returns the group of one allocation.
+
+        Args:
+            index (int): The index of the allocation.
+
+        Returns:
+            str: The name of the allocated group.
+        """
+        return self.groups[int(self.codes(index, index + 1)[0])]
+
+    def shard(self, shard_index, n_shards, n_allocations):
+        """Computes the codes of one of ``n_shards`` contiguous, near-equal parts of the first ``n_allocations``.
+
+        Concatenating the shards in order gives ``codes(0, n_allocations)``.
+
+        Args:
+            shard_index (int): The shard, from 0 to ``n_shards - 1``.
+            n_shards (int): The number of shards.
+            n_allocations (int): The total number of allocations.
+
+        Returns:
+            np.ndarray: The group codes of the shard's allocations.
+        """
+        if not 0 <= shard_index < n_shards:
+            raise ValueError(f"Expected a shard index in 0..{n_shards - 1}, got {shard_index}")
+        return self.codes(n_allocations * shard_index // n_shards, n_allocations * (shard_index + 1) // n_shards)
+
+    def export(self, path, n_allocations, chunk_size=2**22):
+        """Stores the first ``n_allocations`` allocations as a memory-mapped schedule file.
+
+        Open the file with ``schedule_files.ScheduleFile``; its header records the design and the seed, from which
+        ``CounterSchedule`` recomputes any allocation.
+
+        Args:
+            path (str): The file to write.
+            n_allocations (int): The number of allocations to store.
+            chunk_size (int, optional): The number of allocations computed at a time. Defaults to 2^22.
+        """
+        chunks = (self.codes(start, min(start + chunk_size, n_allocations))
+                  for start in range(0, n_allocations, chunk_size))
+        write_schedule(path, self.groups, chunks, n_allocations,
+                       design={'type': 'counter', 'block_sizes': self.block_sizes, 'frame_size': self.frame_size},
+                       seed=seed_metadata(self.seed_sequence))
@@ -0,0 +1,138 @@
+"""
+A module for serving allocations to concurrent enrollment requests from a local asyncio process.
+
+Requests that arrive within a short window are coalesced into one ``assign_many`` call of an allocator, in
+arrival order, so each stratum's arrivals keep their order. A batch is allocated as soon as it is full or its window
+closes. Because ``assign_many`` allocates exactly as one-at-a-time calls would, batching changes the latency of
+requests but never the groups they receive. An invalid request only fails itself: a batch that fails is retried one
+request at a time.
+
+The service can be awaited directly by coroutines in the same process, or exposed to other local processes over TCP
+with a newline-delimited JSON protocol: each request line ``{"participant": "P1", "covariates": ["site A", "F"]}``
+is answered, in request order, by a line ``{"participant": "P1", "group": "Treatment"}`` or ``{"error": "..."}``.
+
+Typical usage example:
+
+  service = AllocationService(StratifiedBlockAllocator(['Treatment', 'Control'], block_sizes=[2, 4], seed=42))
+  group = await service.assign('P1', covariates='site A')
+  server = await service.serve('127.0.0.1', 8765)
+"""
+
+import asyncio
+import json
+
+from .allocators import _hashable
+
+class AllocationService():
+    def __init__(self, allocator, window=0.0005, max_batch=1024):
+        """Initializes a micro-batching service in front of an allocator.
+
+        Args:
+            allocator (Allocator): The allocator. It must only be used through the service while it runs.
+            window (float, optional): The longest a request waits for others to join its batch, in seconds.
+                Defaults to 0.5 ms.
+            max_batch (int, optional): The largest batch; a full batch is allocated at once. Defaults to 1024.
+        """
+        self.allocator = allocator
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = []
+        self.n_batches = 0
+        self._timer = None
+
+    async def assign(self, participant, covariates=None):
+        """Allocates one participant as part of the next batch.
+
+        Args:
+            participant: The participant identifier.
+            covariates (optional): The participant's stratum or covariate values, if the design uses them.
+
+        Returns:
+            str: The name of the group the participant is allocated to.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((participant, covariates, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """Allocates every pending request in one ``assign_many`` call and resolves their futures.
+
+        The allocator checks a whole batch before allocating any of it, so a batch that fails has not changed its
+        state. Its requests are then allocated one at a time, and only the invalid ones fail.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        participants, covariates, futures = zip(*batch)
+        try:
+            results = [(group, None) for group in self.allocator.assign_many(list(participants), list(covariates))]
+            self.n_batches += 1
+        except Exception:
+            results = [self._assign_one(participant, participant_covariates)
+                       for participant, participant_covariates in zip(participants, covariates)]
+        for future, (group, error) in zip(futures, results):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(group)
+            else:
+                future.set_exception(error)
+
+    def _assign_one(self, participant, covariates):
+        """Allocates one request on its own, returning its group and None, or None and the error it raised."""
+        try:
+            return self.allocator.assign_many([participant], [covariates])[0], None
+        except Exception as error:
+            return None, error
+
+    async def serve(self, host='127.0.0.1', port=0):
+        """Starts a TCP server answering newline-delimited JSON allocation requests.
+
+        Requests pipelined on one connection are allocated concurrently and answered in request order.
+
+        Args:
+            host (str, optional): The interface to listen on. Defaults to the loopback interface.
+            port (int, optional): The port to listen on. Defaults to 0, any free port.
+
+        Returns:
+            asyncio.Server: The started server; ``server.sockets[0].getsockname()`` gives its address.
+        """
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def _handle_request(self, line):
+        try:
+            request = json.loads(line)
+            participant = request['participant']
+            group = await self.assign(participant, _hashable(request.get('covariates')))
+            return {'participant': participant, 'group': group}
+        except Exception as error:
+            return {'error': f"{type(error).__name__}: {error}"}
+
+    async def _handle_connection(self, reader, writer):
+        responses = asyncio.Queue()
+
+        async def write_responses():
+            while True:
+                task = await responses.get()
+                if task is None:
+                    break
+                writer.write(json.dumps(await task).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        writer_task = asyncio.create_task(write_responses())
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    responses.put_nowait(asyncio.create_task(self._handle_request(line)))
+        finally:
+            responses.put_nowait(None)
+            await writer_task
+            writer.close()
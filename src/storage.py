@@ -0,0 +1,144 @@
+"""
+A module for persisting the allocations and state of sequential allocators in a local SQLite database.
+
+Every allocation is recorded with its participant, stratum and group. The allocator's running state, as returned by
+``get_state``, is saved in the same transaction. Allocations are group-committed: they are buffered and written
+``batch_size`` at a time, so a commit, and its fsync, is shared by many allocations. After a crash, reopening the
+store restores the allocator from the state of the last committed batch, with no need to replay the allocation
+history. Allocations of the batch in flight are lost together with the state changes they made. Use
+``batch_size=1``, or call ``commit`` before revealing an allocation, when every allocation must be durable.
+
+The database uses write-ahead logging (WAL), so readers such as reporting jobs never block the allocating process.
+
+Typical usage example:
+
+  allocator = StratifiedBlockAllocator(['Treatment', 'Control'], block_sizes=[2, 4], seed=42)
+  with AllocationStore('trial.db', allocator, batch_size=64) as store:
+      group = store.assign('P1', covariates='site A')
+      store.group_of('P1')    # 'Treatment'
+"""
+
+import json
+import sqlite3
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS allocations (
+    sequence INTEGER PRIMARY KEY,
+    participant TEXT NOT NULL UNIQUE,
+    stratum TEXT,
+    group_name TEXT NOT NULL,
+    allocated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS allocations_stratum ON allocations (stratum);
+CREATE TABLE IF NOT EXISTS allocator_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    allocator TEXT NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+class AllocationStore():
+    def __init__(self, path, allocator, batch_size=256):
+        """Opens (or creates) a store and resumes the allocator from its last committed state.
+
+        Args:
+            path (str): The SQLite database file.
+            allocator (Allocator): The allocator to persist. It must be configured like the one whose state is
+                stored, e.g. with the same groups and block sizes; its seed is replaced by the stored state.
+            batch_size (int, optional): The number of allocations written per commit. Defaults to 256.
+
+        Raises:
+            ValueError: If the store holds the state of a different kind of allocator.
+        """
+        if batch_size < 1:
+            raise ValueError(f"The batch size must be at least 1, got {batch_size}")
+        self.allocator = allocator
+        self.batch_size = batch_size
+        self.pending = []
+        self._pending_groups = {}
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+        row = self.connection.execute('SELECT allocator, state FROM allocator_state WHERE id = 1').fetchone()
+        if row is not None:
+            if row[0] != type(allocator).__name__:
+                self.connection.close()
+                raise ValueError(f"The store holds the state of a {row[0]}, not of a {type(allocator).__name__}")
+            allocator.set_state(json.loads(row[1]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def assign(self, participant, covariates=None):
+        """Allocates one arriving participant and buffers the allocation for the next group commit.
+
+        A participant that was already allocated keeps their group and does not advance the allocator.
+
+        Args:
+            participant (str or int): The participant identifier.
+            covariates (optional): The participant's stratum or covariate values, if the design uses them. They are
+                stored as JSON.
+
+        Returns:
+            str: The name of the group the participant is allocated to.
+        """
+        group = self.group_of(participant)
+        if group is not None:
+            return group
+        group = self.allocator.assign(participant, covariates)
+        stratum = None if covariates is None else json.dumps(covariates)
+        self.pending.append((participant, stratum, group, time.time()))
+        self._pending_groups[participant] = group
+        if len(self.pending) >= self.batch_size:
+            self.commit()
+        return group
+
+    def group_of(self, participant):
+        """Looks up the group of an allocated participant, committed or not.
+
+        Args:
+            participant (str or int): The participant identifier.
+
+        Returns:
+            str: The name of the participant's group, or None if the participant was not allocated.
+        """
+        group = self._pending_groups.get(participant)
+        if group is not None:
+            return group
+        row = self.connection.execute('SELECT group_name FROM allocations WHERE participant = ?',
+                                      (participant,)).fetchone()
+        return None if row is None else row[0]
+
+    def stratum_counts(self, covariates):
+        """Counts the committed allocations of one stratum per group, through the stratum index.
+
+        Args:
+            covariates: The stratum or covariate values, as passed to ``assign``.
+
+        Returns:
+            dict: A dictionary with group names as keys and the number of committed allocations as values.
+        """
+        rows = self.connection.execute('SELECT group_name, COUNT(*) FROM allocations WHERE stratum = ? '
+                                       'GROUP BY group_name', (json.dumps(covariates),))
+        return dict(rows.fetchall())
+
+    def commit(self):
+        """Writes the buffered allocations and the allocator state in one transaction."""
+        state = json.dumps(self.allocator.get_state())
+        with self.connection:
+            self.connection.executemany('INSERT INTO allocations (participant, stratum, group_name, allocated_at) '
+                                        'VALUES (?, ?, ?, ?)', self.pending)
+            self.connection.execute('INSERT OR REPLACE INTO allocator_state (id, allocator, state) VALUES (1, ?, ?)',
+                                    (type(self.allocator).__name__, state))
+        self.pending = []
+        self._pending_groups = {}
+
+    def close(self):
+        """Commits the buffered allocations and closes the database."""
+        self.commit()
+        self.connection.close()
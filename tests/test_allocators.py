@@ -0,0 +1,129 @@
+import src.allocators as alc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pytest
+
+GROUPS = ['Treatment', 'Control']
+
+def test_simple_allocator_uses_every_group():
+    """Test that simple allocation reaches every group and is reproducible with a seed."""
+    first = alc.SimpleAllocator(GROUPS, seed=42)
+    second = alc.SimpleAllocator(GROUPS, seed=42)
+    groups = [first.assign(f'P{i}') for i in range(100)]
+    assert set(groups) == set(GROUPS)
+    assert groups == [second.assign(f'P{i}') for i in range(100)], "Same seed did not reproduce the allocations"
+    assert first.n_assigned == 100
+
+def test_incomplete_allocator_cannot_be_created():
+    """Test that a sequential allocator without a _next_code fails when it is created, not at its first assign."""
+    class IncompleteAllocator(alc.SequentialAllocator):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteAllocator(GROUPS, seed=1)
+
+def test_permuted_block_allocator_balances_every_block():
+    """Test that fixed-size blocks are balanced after every completed block."""
+    allocator = alc.PermutedBlockAllocator(GROUPS, block_sizes=[4], seed=42)
+    groups = [allocator.assign(f'P{i}') for i in range(40)]
+    for start in range(0, 40, 4):
+        assert Counter(groups[start:start + 4]) == {'Treatment': 2, 'Control': 2}
+    with pytest.raises(ValueError):
+        alc.PermutedBlockAllocator(GROUPS, block_sizes=[3])
+
+def test_stratified_block_allocator_balances_each_stratum():
+    """Test that each stratum follows its own balanced blocks regardless of interleaving."""
+    allocator = alc.StratifiedBlockAllocator(GROUPS, block_sizes=[2, 4], seed=42)
+    allocations = {'young': [], 'old': []}
+    for i in range(48):
+        stratum = 'young' if i % 3 else 'old'
+        allocations[stratum].append(allocator.assign(f'P{i}', covariates=stratum))
+    for groups in allocations.values():
+        counts = Counter(groups)
+        assert abs(counts['Treatment'] - counts['Control']) <= 2, "A stratum is not balanced"
+
+def test_minimization_allocator_balances_factors_with_new_levels():
+    """Test that streaming minimization balances factor margins while new levels keep appearing."""
+    allocator = alc.MinimizationAllocator(GROUPS, factor_weights=[1, 1], seed=42)
+    arrivals = [(f'P{i}', (i % 2, f'site{i % 9}')) for i in range(90)]
+    groups = [allocator.assign(participant, covariates) for participant, covariates in arrivals]
+    for factor in (0, 1):
+        margins = Counter((covariates[factor], group) for (_, covariates), group in zip(arrivals, groups))
+        for level in {covariates[factor] for _, covariates in arrivals}:
+            assert abs(margins[level, 'Treatment'] - margins[level, 'Control']) <= 2
+    with pytest.raises(ValueError):
+        allocator.assign('P90', covariates=(0,))
+
+@pytest.mark.parametrize('make_allocator, covariates', [
+    (lambda: alc.SimpleAllocator(['A', 'B'], seed=1, bit_generator='philox'), lambda i: None),
+    (lambda: alc.PermutedBlockAllocator(['A', 'B'], block_sizes=[2, 4], seed=1), lambda i: None),
+    (lambda: alc.StratifiedBlockAllocator(['A', 'B', 'C'], block_sizes=[3, 6], seed=1), lambda i: ('site', i % 3)),
+    (lambda: alc.MinimizationAllocator(['A', 'B'], p=0.8, seed=1), lambda i: (f'site {i % 4}', i % 2)),
+])
+def test_restored_state_continues_the_same_allocations(make_allocator, covariates):
+    """Test that an allocator restored from a JSON round trip of its state allocates exactly like the original."""
+    allocator, restored = make_allocator(), make_allocator()
+    for i in range(37):
+        allocator.assign(f'P{i}', covariates(i))
+    restored.set_state(json.loads(json.dumps(allocator.get_state())))
+    assert [allocator.assign(f'P{i}', covariates(i)) for i in range(37, 120)] == \
+        [restored.assign(f'P{i}', covariates(i)) for i in range(37, 120)], "The restored allocator should continue identically"
+
+@pytest.mark.parametrize('make_allocator, covariates', [
+    (lambda: alc.SimpleAllocator(['A', 'B', 'C'], seed=2), lambda i: None),
+    (lambda: alc.PermutedBlockAllocator(['A', 'B'], block_sizes=[2, 4], seed=2), lambda i: None),
+    (lambda: alc.StratifiedBlockAllocator(['A', 'B'], block_sizes=[2, 4, 6], seed=2), lambda i: ('site', i % 5)),
+    (lambda: alc.MinimizationAllocator(['A', 'B'], p=0.8, seed=2), lambda i: (f'site {i % 4}', i % 2)),
+])
+def test_assign_many_matches_one_at_a_time(make_allocator, covariates):
+    """Test that allocating in batches of any size gives the same groups as allocating one participant at a time."""
+    batched, sequential = make_allocator(), make_allocator()
+    participants = [f'P{i}' for i in range(300)]
+    groups, start = [], 0
+    for size in [1, 7, 64, 3, 100, 125]:
+        stop = start + size
+        groups += batched.assign_many(participants[start:stop], [covariates(i) for i in range(start, stop)])
+        start = stop
+    assert groups == [sequential.assign(p, covariates(i)) for i, p in enumerate(participants)], \
+        "Batches should not change the allocations"
+    assert batched.get_state() == sequential.get_state(), "Batches should leave the same state"
+
+def test_concurrent_allocator_is_independent_of_thread_interleaving():
+    """Test that threads allocating to their own strata get the allocations of a single thread, in any stratum order."""
+    def make_allocator():
+        return alc.ConcurrentStratifiedBlockAllocator(GROUPS, block_sizes=[2, 4], seed=7)
+
+    allocator = make_allocator()
+    def enrol(site):
+        return [allocator.assign(f'{site}-{i}', ('site', site)) for i in range(500)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        threaded = list(executor.map(enrol, range(8)))
+    assert allocator.n_assigned == 4000, "Every allocation should be counted"
+
+    reference = make_allocator()
+    single = {site: [reference.assign(f'{site}-{i}', ('site', site)) for i in range(500)] for site in reversed(range(8))}
+    assert threaded == [single[site] for site in range(8)], "A stratum should only depend on the seed and its arrivals"
+    for groups in threaded:
+        assert abs(groups.count('Treatment') - groups.count('Control')) <= 2, "A stratum is not balanced"
+
+def test_concurrent_allocator_shares_only_the_allocator_interface():
+    """Test that the concurrent allocator is an Allocator but does not claim the single-stream SequentialAllocator API."""
+    allocator = alc.ConcurrentStratifiedBlockAllocator(GROUPS, block_sizes=[2], seed=1)
+    assert isinstance(allocator, alc.Allocator) and not isinstance(allocator, alc.SequentialAllocator)
+    with pytest.raises(ValueError):
+        allocator.assign_many(['P1', 'P2'], [('site', 1), ['site', 2]])
+    assert allocator.n_assigned == 0, "A batch with an unhashable stratum should not allocate anyone"
+
+def test_concurrent_allocator_state_and_batches():
+    """Test that the concurrent allocator restores its state and allocates batches like one-at-a-time calls."""
+    allocator = alc.ConcurrentStratifiedBlockAllocator(GROUPS, block_sizes=[2, 4, 6], seed=3)
+    strata = [('site', i % 5) for i in range(120)]
+    batched = allocator.assign_many([f'P{i}' for i in range(60)], strata[:60])
+    restored = alc.ConcurrentStratifiedBlockAllocator(GROUPS, block_sizes=[2, 4, 6], seed=None)
+    restored.set_state(json.loads(json.dumps(allocator.get_state())))
+    assert [restored.assign(f'P{i}', strata[i]) for i in range(60, 120)] == \
+        [allocator.assign(f'P{i}', strata[i]) for i in range(60, 120)], "The restored allocator should continue identically"
+
+    reference = alc.ConcurrentStratifiedBlockAllocator(GROUPS, block_sizes=[2, 4, 6], seed=3)
+    assert batched == [reference.assign(f'P{i}', strata[i]) for i in range(60)], "Batches should not change allocations"
@@ -0,0 +1,78 @@
+import src.assignments as asg
+import src.randomizations as rdz
+import numpy as np
+import pytest
+
+def test_codes_use_smallest_dtype():
+    """Test that group codes are stored in the smallest integer dtype that fits the number of groups."""
+    assert asg.group_code_dtype(2) == np.int8
+    assert asg.group_code_dtype(128) == np.int8
+    assert asg.group_code_dtype(129) == np.int16
+    assert asg.group_code_dtype(40000) == np.int32
+
+def test_dict_view_matches_codes():
+    """Test that the lazy dictionary view lists exactly the participants carrying each group code."""
+    assignment = asg.Assignment(['P1', 'P2', 'P3', 'P4', 'P5'], ['Treatment', 'Control'], [0, 1, 1, 0, 0])
+    assert assignment.codes.dtype == np.int8
+    assert assignment == {'Treatment': ['P1', 'P4', 'P5'], 'Control': ['P2', 'P3']}
+    assert assignment.group_sizes() == {'Treatment': 3, 'Control': 2}
+    assert assignment.group_labels() == ['Treatment', 'Control', 'Control', 'Treatment', 'Treatment']
+    assert 'Treatment' in assignment and 'Placebo' not in assignment
+    with pytest.raises(KeyError):
+        assignment['Placebo']
+
+def test_array_participants_are_not_copied():
+    """Test that participant arrays are referenced rather than copied."""
+    participants = np.arange(10)
+    assignment = asg.Assignment(participants, ['Treatment', 'Control'], np.zeros(10, dtype=np.int8))
+    assert assignment.participants is participants
+    with pytest.raises(ValueError):
+        asg.Assignment(participants, ['Treatment', 'Control'], [0, 1])
+
+def test_methods_return_assignments():
+    """Test that randomization methods return assignments whose views cover every participant once."""
+    participants = [f'P{i}' for i in range(12)]
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control', 'Placebo'], seed=42)
+    assignment = randomizer.block_randomization(block_size=6)
+    assert isinstance(assignment, asg.Assignment)
+    assert sorted(p for members in assignment.values() for p in members) == sorted(participants)
+    assert randomizer.randomization_check(assignment) == {'Treatment': 4, 'Control': 4, 'Placebo': 4}
+
+def test_participant_index_round_trips_ids():
+    """Test that interned positions map back to the same identifiers."""
+    index = asg.ParticipantIndex(['P3', 'P1', 'P2'])
+    assert index.position('P1') == 1
+    positions = index.positions(['P2', 'P3'])
+    assert positions.dtype == np.int32 and positions.tolist() == [2, 0]
+    assert index.ids_at(positions).tolist() == ['P2', 'P3']
+    with pytest.raises(KeyError):
+        index.position('P4')
+    with pytest.raises(ValueError):
+        asg.ParticipantIndex(['P1', 'P1']).position('P1')
+
+def test_randomizer_index_follows_participant_order():
+    """Test that the randomizer's index is rebuilt after participants are reordered in place."""
+    randomizer = rdz.Randomizations([f'P{i}' for i in range(10)], ['Treatment', 'Control'], seed=42)
+    assert randomizer.index.position('P0') == 0
+    randomizer.simple_randomization()
+    assert randomizer.index.ids_at(randomizer.index.position('P0')) == 'P0'
+    assert randomizer.index.position('P0') == randomizer.participants.index('P0')
+
+def test_reverse_lookup_of_single_and_batched_participants():
+    """Test that participants are found in their group by single and batched lookups."""
+    assignment = asg.Assignment(['P1', 'P2', 'P3', 'P4'], ['Treatment', 'Control'], [1, 0, 0, 1])
+    assert assignment.group_of('P3') == 'Treatment'
+    assert assignment.groups_of(['P4', 'P2']) == ['Control', 'Treatment']
+    with pytest.raises(KeyError):
+        assignment.group_of('P5')
+
+def test_batched_lookup_binary_searches_typed_ids():
+    """Test that typed identifier arrays are resolved by binary search, including unknown identifiers."""
+    participants = np.array([50, 10, 40, 20, 30])
+    assignment = asg.Assignment(participants, ['Treatment', 'Control'], [0, 1, 0, 1, 0])
+    assert assignment.codes_for(np.array([20, 50, 20, 30])).tolist() == [1, 0, 1, 0]
+    assert assignment.index.positions(np.array([40, 10])).tolist() == [2, 1]
+    with pytest.raises(KeyError):
+        assignment.codes_for(np.array([20, 60]))
+    names = asg.Assignment(np.array(['b', 'a', 'c']), ['Treatment', 'Control'], [0, 1, 1])
+    assert names.groups_of(np.array(['c', 'b'])) == ['Control', 'Treatment']
@@ -0,0 +1,18 @@
+import benchmarks.benchmark_randomizations as bench
+
+def test_every_case_runs_and_reports_measurements():
+    """Test that every benchmarked method runs on a small roster and reports its time and memory."""
+    cases = list(bench.iter_cases(list(bench.CASES), sizes=[200], arms=[4], partitions=[5, 500]))
+    assert len(cases) == len(bench.CASES), "Partition counts above the roster size should be skipped"
+    for case in cases:
+        result = bench.run_case(*case, repeats=1)
+        assert result['seconds'] > 0 and result['peak_bytes'] > 0, f"{case[0]} should report its measurements"
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    """Test that only measurements exceeding both the tolerance and the noise floor are flagged."""
+    baseline = [{'method': 'minimization', 'participants': 10**6, 'arms': 2, 'partitions': 10,
+                 'seconds': 1.0, 'peak_bytes': 2**20}]
+    faster = [dict(baseline[0], seconds=1.2, peak_bytes=2**20 + 2**10)]
+    slower = [dict(baseline[0], seconds=1.5)]
+    assert bench.compare(faster, baseline, tolerance=0.25) == [], "Changes within the tolerance should pass"
+    assert len(bench.compare(slower, baseline, tolerance=0.25)) == 1, "A 50% slowdown should be flagged"
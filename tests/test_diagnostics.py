@@ -0,0 +1,53 @@
+import src.diagnostics as dgn
+import src.randomizations as rdz
+import numpy as np
+import pytest
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(7)
+    codes = rng.integers(0, 3, 600).astype(np.int8)
+    covariates = rng.normal(100.0, 5.0, (600, 4)) + codes[:, None] * [0.0, 0.0, 0.0, 2.0]
+    return codes, covariates
+
+def test_smd_and_variance_ratio_match_direct_computation(data):
+    """Test that the grouped moments reproduce per-group means and variances computed directly."""
+    codes, covariates = data
+    report = dgn.balance_report(codes, covariates, max_bytes=1000)
+    for k in range(3):
+        group, reference = covariates[codes == k], covariates[codes == 0]
+        smd = (group.mean(0) - reference.mean(0)) / np.sqrt((group.var(0, ddof=1) + reference.var(0, ddof=1)) / 2)
+        assert np.allclose(report['smd'][k], smd), "SMDs should match the direct computation"
+        assert np.allclose(report['variance_ratio'][k], group.var(0, ddof=1) / reference.var(0, ddof=1)), \
+            "Variance ratios should match the direct computation"
+    assert report['group_sizes'].tolist() == np.bincount(codes).tolist(), "Group sizes should be counted"
+    assert report['max_abs_smd'] > 0.3, "The shifted covariate should show up as imbalance"
+
+def test_mahalanobis_imbalance_matches_direct_computation(data):
+    """Test the omnibus Mahalanobis statistic and that it flags a covariate shifted between groups."""
+    codes, covariates = data
+    mean, covariance = covariates.mean(0), np.cov(covariates.T)
+    expected = sum((codes == k).sum() * (covariates[codes == k].mean(0) - mean)
+                   @ np.linalg.solve(covariance, covariates[codes == k].mean(0) - mean) for k in range(3))
+    mahalanobis = dgn.balance_report(codes, covariates)['mahalanobis']
+    assert np.isclose(mahalanobis['statistic'], expected), "The statistic should match the direct computation"
+    assert mahalanobis['df'] == 8 and mahalanobis['p_value'] < 1e-6, "The imbalance should be highly significant"
+
+def test_chi_square_tests_and_survival_function():
+    """Test the chi-square survival function at known quantiles and the contingency tests of categorical covariates."""
+    for statistic, df in [(3.841459, 1), (5.991465, 2), (7.814728, 3), (18.307038, 10)]:
+        assert abs(dgn.chi2_sf(statistic, df) - 0.05) < 1e-6, f"The 95% quantile with {df} df should give 0.05"
+        assert abs(dgn.chi2_isf(0.05, df) - statistic) < 1e-5, f"The 95% quantile with {df} df should be inverted"
+    codes = np.repeat([0, 1], 100)
+    sites = np.where(np.arange(200) % 2 == 0, 'A', 'B')
+    tests = dgn.balance_report(codes, categorical=np.column_stack([sites, codes]))['chi_square']
+    assert tests['statistic'][0] == 0 and tests['p_value'][0] == 1, "Balanced sites should show no imbalance"
+    assert tests['df'][1] == 1 and tests['p_value'][1] < 1e-20, "A covariate equal to the group should be flagged"
+
+def test_randomizer_balance_report_aligns_dict_groups_to_participants():
+    """Test that the randomizer reports balance for dictionary assignments with covariates aligned to participants."""
+    randomizer = rdz.Randomizations([f'P{i}' for i in range(8)], ['Treatment', 'Control'], seed=1)
+    groups = {'Control': ['P0', 'P1', 'P2', 'P3'], 'Treatment': ['P4', 'P5', 'P6', 'P7']}
+    report = randomizer.balance_report(groups, covariates=np.arange(8.0), reference='Control')
+    assert report['means'][:, 0].tolist() == [5.5, 1.5], "Means should follow the order of the randomizer's groups"
+    assert report['smd'][1, 0] == 0, "The reference group should have no difference with itself"
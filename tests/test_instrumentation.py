@@ -0,0 +1,42 @@
+import src.instrumentation as ins
+import src.randomizations as rdz
+import logging
+
+def make_randomizer(metrics=None):
+    participants = [f'P{i}' for i in range(40)]
+    return rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42, metrics=metrics)
+
+def test_instrumentation_records_timers_draws_and_evaluations():
+    """Test that an instrumented randomizer times its methods and counts random draws and imbalance evaluations."""
+    metrics = ins.Metrics()
+    events = []
+    metrics.add_callback(lambda kind, name, value: events.append((kind, name)))
+    randomizer = make_randomizer(metrics)
+    covariates = {participant: i % 3 for i, participant in enumerate(randomizer.participants)}
+    randomizer.simple_randomization(vectorized=True)
+    randomizer.pocock_simon_minimization({participant: (level,) for participant, level in covariates.items()})
+    randomizer.minimization(covariates)
+
+    assert metrics.timers['simple_randomization']['allocations'] == 40, "Each call should count its allocations"
+    assert metrics.allocations_per_second('minimization') > 0, "Throughput should be derived from the timers"
+    assert metrics.counters['rng_draws'] >= 40, "Shuffling 40 codes should count 40 draws"
+    assert metrics.counters['imbalance_evaluations'] == 80, "Both minimizations should score every arrival"
+    assert ('timer', 'pocock_simon_minimization') in events, "Callbacks should receive every measurement"
+
+def test_instrumentation_does_not_change_assignments():
+    """Test that instrumented and uninstrumented randomizers with the same seed give identical assignments."""
+    plain, instrumented = make_randomizer(), make_randomizer(ins.Metrics())
+    assert plain.permuted_block_randomization([2, 4]).to_dict() == instrumented.permuted_block_randomization([2, 4]).to_dict(), \
+        "Counting draws should not change the random stream"
+    assert plain.metrics is None, "Instrumentation should be off by default"
+
+def test_randomization_check_logs_instead_of_printing(capsys, caplog):
+    """Test that randomization_check logs group sizes and records them as gauges instead of printing them."""
+    metrics = ins.Metrics()
+    randomizer = make_randomizer(metrics)
+    with caplog.at_level(logging.INFO, logger='src.randomizations'):
+        sizes = randomizer.randomization_check(randomizer.block_randomization(block_size=4))
+    assert capsys.readouterr().out == "", "Nothing should be printed"
+    assert "Group sizes" in caplog.text, "The group sizes should be logged"
+    assert metrics.gauges == {'group_size.Treatment': sizes['Treatment'], 'group_size.Control': sizes['Control']}, \
+        "The group sizes should be observed as gauges"
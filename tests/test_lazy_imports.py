@@ -0,0 +1,69 @@
+import src.lazy_imports as lzy
+import src.randomizations as rdz
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import src.randomizations, src.allocators, src.assignments
+seconds = time.perf_counter() - start
+print(seconds, 'numpy._core' in sys.modules)
+"""
+
+def test_importing_the_randomization_api_defers_numpy():
+    """Test that a fresh interpreter imports the randomization API within budget and without executing NumPy."""
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=REPOSITORY, capture_output=True, text=True,
+                            check=True).stdout.split()
+    assert output[1] == 'False', "NumPy should not be executed at import time"
+    assert float(output[0]) < 0.1, f"Importing the randomization API took {float(output[0]):.3f}s"
+
+def test_hash_assign_runs_without_numpy():
+    """Test that the pure-Python hash assignment path never loads NumPy and agrees with the vectorised path."""
+    script = ("import json, sys; import src.randomizations as rdz; "
+              "r = rdz.Randomizations(['P1', 'P2', 'P3', 'P4', 'P5', 'P6'], ['Treatment', 'Control'], seed=1); "
+              "print(json.dumps([[r.hash_assign(p, salt='s') for p in r.participants], 'numpy._core' in sys.modules]))")
+    output = subprocess.run([sys.executable, '-c', script], cwd=REPOSITORY, capture_output=True, text=True,
+                            check=True).stdout
+    groups, numpy_loaded = json.loads(output)
+    assert not numpy_loaded, "hash_assign should not load NumPy"
+    randomizer = rdz.Randomizations(['P1', 'P2', 'P3', 'P4', 'P5', 'P6'], ['Treatment', 'Control'], seed=1)
+    assert groups == randomizer.hash_randomization(salt='s').group_labels(), \
+        "hash_assign should agree with hash_randomization"
+
+THREADS_SCRIPT = """
+import sys, threading
+import src.allocators as alc, src.randomizations as rdz
+errors = []
+barrier = threading.Barrier(16)
+def enrol(i):
+    barrier.wait()
+    try:
+        alc.ConcurrentStratifiedBlockAllocator(['Treatment', 'Control'], block_sizes=[2], seed=i).assign('P1', i)
+        rdz.Randomizations([f'P{j}' for j in range(8)], ['Treatment', 'Control'], seed=i).block_randomization(4)
+    except Exception as error:
+        errors.append(repr(error))
+threads = [threading.Thread(target=enrol, args=(i,)) for i in range(16)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+print(errors)
+"""
+
+def test_first_numpy_use_is_thread_safe():
+    """Test that threads making their first NumPy call at once in a fresh interpreter all see the loaded module."""
+    output = subprocess.run([sys.executable, '-c', THREADS_SCRIPT], cwd=REPOSITORY, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.strip() == '[]', f"Threads failed on first use of NumPy: {output}"
+
+def test_lazy_import_returns_loaded_modules_and_rejects_missing_ones():
+    """Test that lazy_import reuses imported modules and fails early for modules that are not installed."""
+    assert lzy.lazy_import('os') is os, "Already imported modules should be returned as is"
+    with pytest.raises(ModuleNotFoundError):
+        lzy.lazy_import('a_module_that_does_not_exist')
@@ -0,0 +1,33 @@
+import src.parallel as par
+import src.permutation_tests as pt
+import src.randomizations as rdz
+import numpy as np
+import pytest
+
+@pytest.fixture
+def randomizer():
+    participants = [f'P{i}' for i in range(40)]
+    return rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42)
+
+def test_draws_are_identical_for_any_worker_count(randomizer):
+    """Test that the draws depend on the seed and task size but not on the number of workers."""
+    design = randomizer.batch_design('block', block_size=4)
+    results = [np.concatenate(par.ParallelExecutor(max_workers, draws_per_task=7).map(design.draw, 50, seed=3))
+               for max_workers in (1, 2, 3)]
+    assert results[0].shape == (50, 40)
+    assert all((result == results[0]).all() for result in results[1:]), "Worker count changed the draws"
+    other_seed = np.concatenate(par.ParallelExecutor(1, draws_per_task=7).map(design.draw, 50, seed=4))
+    assert not (other_seed == results[0]).all()
+
+def test_parallel_permutation_test_is_reproducible(randomizer):
+    """Test that parallel p-values are bit-identical across worker counts for the same seed."""
+    outcomes = np.arange(40, dtype=float)
+    assignment = randomizer.block_randomization(block_size=4)
+    p_values = []
+    for max_workers in (1, 2):
+        replay = rdz.Randomizations(randomizer.participants, randomizer.groups, seed=42)
+        test = pt.PermutationTest(replay, outcomes, design='block', block_size=4)
+        result = test.run(assignment, n_draws=2000, executor=par.ParallelExecutor(max_workers, draws_per_task=300))
+        p_values.append(result['p_value'])
+    assert p_values[0] == p_values[1]
+    assert 0 < p_values[0] <= 1
@@ -0,0 +1,68 @@
+import src.permutation_tests as pt
+import src.randomizations as rdz
+import numpy as np
+import pytest
+import tracemalloc
+
+@pytest.fixture
+def randomizer():
+    participants = ['P1', 'P2', 'P3', 'P4', 'P5', 'P6', 'P7', 'P8']
+    groups = ['Treatment', 'Control']
+    return rdz.Randomizations(participants, groups, seed=42)
+
+def test_exact_p_value(randomizer):
+    """Test the exact p-value when the treated group holds the four largest outcomes."""
+    outcomes = [10, 11, 12, 13, 0, 1, 2, 3]
+    observed = np.array([0, 0, 0, 0, 1, 1, 1, 1])
+    result = pt.PermutationTest(randomizer, outcomes).run(observed, exact=True)
+    assert result['statistic'] == pytest.approx(10.0)
+    assert result['n_draws'] == 70 and result['exact']
+    assert result['p_value'] == pytest.approx(2 / 70), "Only the observed and mirrored assignments are as extreme"
+    one_sided = pt.PermutationTest(randomizer, outcomes, alternative='greater').run(observed, exact=True)
+    assert one_sided['p_value'] == pytest.approx(1 / 70)
+
+def test_exact_p_value_respects_blocks(randomizer):
+    """Test that exact enumeration only permutes within blocks."""
+    outcomes = [10, 11, 0, 1, 12, 13, 2, 3]
+    observed = np.array([0, 0, 1, 1, 0, 0, 1, 1])
+    result = pt.PermutationTest(randomizer, outcomes, design='block', block_size=4).run(observed, exact=True)
+    assert result['n_draws'] == 36
+    assert result['p_value'] == pytest.approx(2 / 36)
+
+def test_monte_carlo_p_value_matches_exact(randomizer):
+    """Test that the Monte Carlo p-value approximates the exact one and accepts Assignment results."""
+    outcomes = np.array([3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0])
+    assignment = randomizer.simple_randomization()
+    test = pt.PermutationTest(randomizer, outcomes)
+    exact = test.run(assignment, exact=True)
+    sampled = test.run(assignment, n_draws=20000, max_bytes=2**12)
+    assert not sampled['exact'] and sampled['statistic'] == exact['statistic']
+    assert abs(sampled['p_value'] - exact['p_value']) < 0.02
+
+def test_rejects_bad_arguments(randomizer):
+    """Test that unknown alternatives, misaligned outcomes and oversized exact tests are rejected."""
+    with pytest.raises(ValueError):
+        pt.PermutationTest(randomizer, np.zeros(8), alternative='sideways')
+    with pytest.raises(ValueError):
+        pt.PermutationTest(randomizer, np.zeros(5))
+    with pytest.raises(ValueError):
+        pt.PermutationTest(randomizer, np.zeros(8)).run(np.zeros(8, dtype=np.int8), exact=True, max_exact=10)
+
+@pytest.mark.parametrize('design, design_args', [
+    ('simple', {}),
+    ('cluster', {'clusters': np.arange(20000) // 10}),
+])
+def test_monte_carlo_draws_stay_within_max_bytes(design, design_args):
+    """Test that the draws and their statistics together stay near the memory budget."""
+    participants = np.arange(20000)
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=1)
+    outcomes = np.random.default_rng(0).normal(size=len(participants))
+    test = pt.PermutationTest(randomizer, outcomes, design=design, **design_args)
+    observed = np.arange(len(participants)) % 2
+    tracemalloc.start()
+    try:
+        test.run(observed, n_draws=500, max_bytes=4 * 2**20)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 8 * 2**20, f"Peak memory of {peak / 2**20:.1f} MiB is far above the 4 MiB budget"
@@ -1,5 +1,9 @@
+import src.diagnostics as dgn
 import src.randomizations as rdz
 from collections import Counter
+from itertools import islice
+import random
+import numpy as np
 import pytest
 
 @pytest.fixture
@@ -56,3 +60,285 @@ def test_uneven_distribution():
     rand_instance = rdz.Randomizations(participants, groups, seed=42)
     randomized_groups = rand_instance.simple_randomization()
     assert len(randomized_groups['Treatment']) + len(randomized_groups['Control']) == len(participants), "Not all participants are distributed among groups"
+
+def test_minimization_balances_covariate_levels():
+    """Test that minimization spreads each covariate level evenly across groups."""
+    participants = [f'P{i}' for i in range(12)]
+    groups = ['Treatment', 'Control', 'Placebo']
+    covariates = {participant: 'A' if i % 3 else 'B' for i, participant in enumerate(participants)}
+    minimized_groups = rdz.Randomizations(participants, groups).minimization(covariates)
+    for level in ('A', 'B'):
+        level_counts = [sum(covariates[p] == level for p in members) for members in minimized_groups.values()]
+        assert max(level_counts) - min(level_counts) <= 1, f"Covariate level {level} is not balanced across groups"
+
+def test_minimization_accepts_list_covariate_values():
+    """Test that list covariate values are compared by value, as before count tables were interned."""
+    participants = [f'P{i}' for i in range(12)]
+    as_lists = {participant: ['site', i % 2] for i, participant in enumerate(participants)}
+    as_tuples = {participant: ('site', i % 2) for i, participant in enumerate(participants)}
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control'])
+    assert randomizer.minimization(as_lists).to_dict() == randomizer.minimization(as_tuples).to_dict()
+    with pytest.raises(ValueError):
+        randomizer.minimization({participant: {'site': 1} for participant in participants})
+
+def test_pocock_simon_balances_factor_margins():
+    """Test that Pocock-Simon minimization balances every factor even when no two covariate profiles match."""
+    participants = [f'P{i}' for i in range(40)]
+    covariates = {participant: (i % 2, i % 5, i) for i, participant in enumerate(participants)}
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42)
+    for imbalance in ('range', 'variance', 'sd'):
+        groups = randomizer.pocock_simon_minimization(covariates, factor_weights=[1, 1, 0], imbalance=imbalance)
+        assert sorted(p for members in groups.values() for p in members) == sorted(participants)
+        for factor in (0, 1):
+            for level in {levels[factor] for levels in covariates.values()}:
+                counts = [sum(covariates[p][factor] == level for p in members) for members in groups.values()]
+                assert abs(counts[0] - counts[1]) <= 2, f"Factor {factor} level {level} is not balanced"
+
+def test_minimizations_accept_covariates_aligned_to_participants():
+    """Test that covariate arrays aligned to the participants give the same allocations as dictionaries."""
+    participants = [f'P{i}' for i in range(60)]
+    levels = np.array([(i % 3, f'site {i % 4}') for i in range(60)])
+    by_participant = {participant: tuple(row) for participant, row in zip(participants, levels.tolist())}
+    first = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=3)
+    second = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=3)
+    assert first.minimization(levels[:, 1]).to_dict() == second.minimization(
+        {participant: row[1] for participant, row in by_participant.items()}).to_dict()
+    assert first.pocock_simon_minimization(levels, p=0.8).to_dict() == \
+        second.pocock_simon_minimization(by_participant, p=0.8).to_dict(), "Arrays and dictionaries should agree"
+
+def test_dictionary_strata_and_clusters_are_left_untouched():
+    """Test that dictionary strata and clusters are randomized on positions without reordering the caller's lists."""
+    participants = [f'P{i}' for i in range(30)]
+    strata = {'young': participants[:13], 'old': participants[13:]}
+    copies = {name: list(members) for name, members in strata.items()}
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42)
+    assignment = randomizer.stratified_randomization(strata)
+    clustered = randomizer.cluster_randomization(strata)
+    assert strata == copies, "The strata should not be shuffled in place"
+    for members in strata.values():
+        counts = np.bincount(assignment.codes_for(members), minlength=2)
+        assert abs(counts[0] - counts[1]) <= 1, "Each stratum should be balanced"
+        assert len(set(clustered.groups_of(members))) == 1, "A cluster should share one group"
+
+@pytest.mark.parametrize('as_array', [False, True])
+def test_roster_edited_in_place_is_reindexed(as_array):
+    """Test that reordering or editing the roster in place after the index is built keeps strata on the right people."""
+    participants = ['P1', 'P2', 'P3', 'P4']
+    roster = np.array(participants) if as_array else list(participants)
+    randomizer = rdz.Randomizations(roster, ['Treatment', 'Control'], seed=42)
+    strata = {'a': participants[:2], 'b': participants[2:]}
+    randomizer.assignment_matrix('stratified', n_draws=20, strata=strata)
+    if as_array:
+        roster[:] = roster[::-1].copy()
+    else:
+        roster.reverse()
+    draws = randomizer.assignment_matrix('stratified', n_draws=20, strata=strata)
+    stratum_a = [i for i, participant in enumerate(roster) if participant in strata['a']]
+    assert (draws[:, stratum_a].sum(axis=1) == 1).all(), "Each draw should treat exactly one member of stratum a"
+    roster[0] = 'P9'
+    with pytest.raises(KeyError):
+        randomizer.assignment_matrix('stratified', n_draws=1, strata=strata)
+
+def test_pocock_simon_rejects_bad_arguments(randomizer):
+    """Test that unknown imbalance metrics and mismatched factor weights are rejected."""
+    covariates = {participant: ('A', 'B') for participant in randomizer.participants}
+    with pytest.raises(ValueError):
+        randomizer.pocock_simon_minimization(covariates, imbalance='entropy')
+    with pytest.raises(ValueError):
+        randomizer.pocock_simon_minimization(covariates, factor_weights=[1, 2, 3])
+
+def test_seeding_leaves_global_random_state_untouched():
+    """Test that seeding and randomizing never touch the global random or NumPy random state."""
+    random_state, numpy_state = random.getstate(), np.random.get_state()[1].copy()
+    randomizer = rdz.Randomizations([f'P{i}' for i in range(20)], ['Treatment', 'Control'], seed=42)
+    randomizer.simple_randomization()
+    randomizer.block_randomization(block_size=4)
+    assert random.getstate() == random_state, "The global random state was modified"
+    assert (np.random.get_state()[1] == numpy_state).all(), "The global NumPy random state was modified"
+
+@pytest.mark.parametrize('bit_generator', ['pcg64', 'philox'])
+def test_independent_seeded_instances(bit_generator):
+    """Test that instances seeded with the same seed sequence child reproduce each other regardless of interleaving."""
+    participants = [f'P{i}' for i in range(20)]
+    children = np.random.SeedSequence(42).spawn(2)
+    first, second = (rdz.Randomizations(participants.copy(), ['Treatment', 'Control'], seed=child, bit_generator=bit_generator)
+                     for child in children)
+    replay = rdz.Randomizations(participants.copy(), ['Treatment', 'Control'], seed=children[0], bit_generator=bit_generator)
+    first_blocks = first.block_randomization(block_size=4)
+    second.block_randomization(block_size=4)
+    assert replay.block_randomization(block_size=4) == first_blocks, "Same seed did not reproduce the allocation"
+
+def test_vectorized_simple_randomization_leaves_participants_untouched():
+    """Test that the vectorized path balances groups without reordering the caller's participants."""
+    participants = np.arange(1001)
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control', 'Placebo'], seed=42)
+    assignment = randomizer.simple_randomization(vectorized=True)
+    assert (participants == np.arange(1001)).all(), "The participant array was modified"
+    assert assignment.participants is participants
+    assert assignment.group_sizes() == {'Treatment': 334, 'Control': 334, 'Placebo': 333}
+    assert (randomizer.simple_randomization(vectorized=True).codes == assignment.codes).all(), "Seeded runs differ"
+
+def test_assignment_matrix_respects_each_design():
+    """Test that batched draws keep groups balanced within blocks and strata and keep clusters together."""
+    participants = [f'P{i}' for i in range(24)]
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42)
+    simple = randomizer.assignment_matrix('simple', n_draws=50)
+    assert simple.shape == (50, 24) and (simple.sum(axis=1) == 12).all()
+    assert len({row.tobytes() for row in simple}) > 1, "All draws are identical"
+
+    block = randomizer.assignment_matrix('block', n_draws=50, block_size=4)
+    assert (block.reshape(50, 6, 4).sum(axis=2) == 2).all(), "A block is not balanced"
+
+    strata = {'young': participants[::3], 'old': [p for i, p in enumerate(participants) if i % 3]}
+    stratified = randomizer.assignment_matrix('stratified', n_draws=50, strata=strata)
+    assert (stratified[:, ::3].sum(axis=1) == 4).all(), "A stratum is not balanced"
+
+    cluster_labels = np.arange(24) // 6
+    cluster = randomizer.assignment_matrix('cluster', n_draws=50, clusters=cluster_labels)
+    assert (cluster.reshape(50, 4, 6).min(axis=2) == cluster.reshape(50, 4, 6).max(axis=2)).all()
+
+def test_assignment_matrix_is_independent_of_chunking():
+    """Test that the memory budget changes the chunking but not the draws."""
+    participants = [f'P{i}' for i in range(30)]
+    for design, kwargs in [('simple', {}), ('block', {'block_size': 6})]:
+        whole = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=7).assignment_matrix(design, 40, **kwargs)
+        chunked = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=7)
+        chunks = list(chunked.iter_assignment_matrix(design, 40, max_bytes=100, **kwargs))
+        assert len(chunks) > 1 and (np.concatenate(chunks) == whole).all(), f"Chunking changed the {design} draws"
+    with pytest.raises(ValueError):
+        rdz.Randomizations(participants, ['Treatment', 'Control']).assignment_matrix('adaptive', 10)
+
+def test_iter_all_assignments_enumerates_each_assignment_once(randomizer):
+    """Test that exhaustive enumeration yields every distinct assignment of the design exactly once."""
+    strata = np.array([0, 0, 0, 1, 1, 1, 2, 2])
+    assert randomizer.assignment_count('stratified', strata=strata) == 18
+    assignments = np.concatenate(list(randomizer.iter_all_assignments('stratified', max_bytes=64, strata=strata)))
+    assert len({row.tobytes() for row in assignments}) == 18
+    assert (assignments[:, 6] != assignments[:, 7]).all(), "A two-member stratum is not split across groups"
+
+def test_permuted_block_schedule_is_lazy_and_balanced():
+    """Test that the schedule lazily yields balanced blocks of the requested sizes."""
+    randomizer = rdz.Randomizations([], ['Treatment', 'Control'], seed=42)
+    blocks = list(islice(randomizer.permuted_block_schedule(block_sizes=[2, 4, 6]), 200))
+    assert {len(block) for block in blocks} == {2, 4, 6}
+    assert all((block == 0).sum() == len(block) // 2 for block in blocks), "A block is not balanced"
+    finite = list(randomizer.permuted_block_schedule(block_sizes=[4], n_allocations=10))
+    assert [len(block) for block in finite] == [4, 4, 4]
+    with pytest.raises(ValueError):
+        randomizer.permuted_block_schedule(block_sizes=[3])
+
+def test_permuted_block_randomization_assigns_each_participant_once():
+    """Test that permuted block randomization neither duplicates nor drops participants."""
+    participants = [f'P{i}' for i in range(10)]
+    groups = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42).permuted_block_randomization([2, 4])
+    assigned = [participant for members in groups.values() for participant in members]
+    assert sorted(assigned) == sorted(participants)
+    assert abs(len(groups['Treatment']) - len(groups['Control'])) <= 2
+
+def test_vectorized_stratified_randomization_balances_each_stratum():
+    """Test that stratum codes are assigned in one pass, balanced within every stratum, without reordering participants."""
+    participants = [f'P{i}' for i in range(300)]
+    strata = np.arange(300) % 7 * 10
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control', 'Placebo'], seed=42)
+    assignment = randomizer.stratified_randomization(strata)
+    assert assignment.participants.tolist() == participants
+    for stratum in np.unique(strata):
+        counts = np.bincount(assignment.codes[strata == stratum], minlength=3)
+        assert counts.max() - counts.min() <= 1, f"Stratum {stratum} is not balanced"
+    with pytest.raises(ValueError):
+        randomizer.stratified_randomization(np.zeros(5, dtype=int))
+
+def test_stratified_randomization_compacts_sparse_and_large_codes():
+    """Test that sparse composite stratum codes up to 2**62 are renumbered rather than counted up to the largest code."""
+    participants = [f'P{i}' for i in range(400)]
+    strata = np.array([0, 5 * 10**9, 2**62 + 1, 2**62 + 7 * 10**9])[np.arange(400) % 4]
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42)
+    assignment = randomizer.stratified_randomization(strata)
+    for stratum in np.unique(strata):
+        counts = np.bincount(assignment.codes[strata == stratum], minlength=2)
+        assert counts[0] == counts[1], f"Stratum {stratum} is not balanced"
+    design = randomizer.batch_design('stratified', strata=strata)
+    assert design.segments.max() == 3, "Sparse codes should be renumbered 0..k-1"
+    assert design._random_bits == 62, "Large codes should not take random bits from the sort key"
+
+def test_csr_cluster_randomization_keeps_clusters_together():
+    """Test that CSR clusters are randomized as units and expanded to every member."""
+    participants = [f'P{i}' for i in range(12)]
+    offsets = np.array([0, 3, 5, 9, 12])
+    members = np.array([0, 4, 8, 1, 2, 3, 5, 6, 7, 9, 10, 11])
+    randomizer = rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42)
+    assignment = randomizer.cluster_randomization((offsets, members))
+    assert assignment.participants.tolist() == participants
+    cluster_codes = [set(assignment.codes[members[start:stop]]) for start, stop in zip(offsets[:-1], offsets[1:])]
+    assert all(len(codes) == 1 for codes in cluster_codes), "A cluster was split across groups"
+    assert sorted(codes.pop() for codes in cluster_codes) == [0, 0, 1, 1]
+    draws = randomizer.assignment_matrix('cluster', n_draws=20, clusters=(offsets, members))
+    assert (draws[:, [0, 4, 8]].min(axis=1) == draws[:, [0, 4, 8]].max(axis=1)).all()
+    with pytest.raises(ValueError):
+        randomizer.cluster_randomization((offsets, members[:-1]))
+
+@pytest.mark.parametrize('offsets, members', [
+    (np.array([1, 3, 5]), np.arange(6)),
+    (np.array([0, 3, 5]), np.arange(6)),
+    (np.array([0, 4, 3, 6]), np.arange(6)),
+    (np.array([0, 3, 7]), np.arange(7)),
+    (np.array([0, 3, 6]), np.array([0, 1, 2, 3, 4, 6])),
+])
+def test_malformed_csr_partitions_are_rejected(offsets, members):
+    """Test that CSR offsets that do not span the members, and members that are not the participants, raise ValueError."""
+    randomizer = rdz.Randomizations([f'P{i}' for i in range(6)], ['Treatment', 'Control'], seed=42)
+    with pytest.raises(ValueError):
+        randomizer.cluster_randomization((offsets, members))
+    with pytest.raises(ValueError):
+        randomizer.assignment_matrix('cluster', n_draws=2, clusters=(offsets, members))
+
+def test_hash_randomization_matches_scalar_lookups():
+    """Test that batched hash assignment agrees with single lookups and ignores the instance seed."""
+    ids = [f'user-{i}' for i in range(2000)] + ['ünïcode', '', 'x' * 40]
+    first = rdz.Randomizations(ids, ['Treatment', 'Control', 'Placebo'], seed=1)
+    second = rdz.Randomizations([], ['Treatment', 'Control', 'Placebo'], seed=2)
+    batch = first.hash_randomization(salt='s3cret', experiment='checkout')
+    assert batch.group_labels() == [second.hash_assign(i, salt='s3cret', experiment='checkout') for i in ids]
+    numeric = second.hash_randomization(salt='s3cret', participants=np.arange(500))
+    assert numeric.group_labels() == [second.hash_assign(i, salt='s3cret') for i in range(500)]
+    other = first.hash_randomization(salt='s3cret', experiment='search')
+    assert (other.codes != batch.codes).any(), "Experiments are not assigned independently"
+
+def test_hash_randomization_encodes_string_arrays_like_scalar_lookups():
+    """Test that ASCII, non-ASCII and integer identifier arrays hash to the UTF-8 bytes of the scalar path."""
+    randomizer = rdz.Randomizations([], ['Treatment', 'Control', 'Placebo'])
+    for ids in (np.array([f'ID{i:06d}' for i in range(300)]), np.array(['日本語日本語', 'Zoë', 'plain', '']),
+                np.arange(-150, 150)):
+        expected = [randomizer.hash_assign(participant, salt='s') for participant in ids.tolist()]
+        assert randomizer.hash_randomization(salt='s', participants=ids).group_labels() == expected, \
+            f"Batched hashing of {ids.dtype} identifiers should match hash_assign"
+
+def test_hash_randomization_follows_weights():
+    """Test that hash buckets follow the arm weights, including arms with zero weight."""
+    randomizer = rdz.Randomizations(np.arange(20000), ['Treatment', 'Control', 'Holdout'])
+    sizes = randomizer.hash_randomization(salt='s', weights=[3, 1, 0]).group_sizes()
+    assert sizes['Holdout'] == 0
+    assert abs(sizes['Treatment'] / 20000 - 0.75) < 0.02
+    with pytest.raises(ValueError):
+        randomizer.hash_assign('P1', weights=[1, 1])
+
+def test_rerandomization_accepts_balanced_candidates_independently_of_batching():
+    """Test that rerandomization accepts a balanced assignment and that the batch size does not change the result."""
+    covariates = np.random.default_rng(3).normal(size=(60, 5))
+    participants = [f'P{i}' for i in range(60)]
+    accepted = [rdz.Randomizations(participants, ['Treatment', 'Control'], seed=42).rerandomization(
+        covariates, threshold=1.0, max_bytes=max_bytes) for max_bytes in (2**12, 2**28)]
+    assert (accepted[0].codes == accepted[1].codes).all(), "The batch size should not change the accepted assignment"
+    assert accepted[0].group_sizes() == {'Treatment': 30, 'Control': 30}, "Candidates should be complete randomizations"
+    imbalance = dgn.balance_report(accepted[0].codes, covariates)['mahalanobis']['statistic']
+    assert imbalance <= 1.0, "The accepted assignment should meet the threshold"
+
+def test_rerandomization_rejects_bad_arguments(randomizer):
+    """Test that rerandomization needs exactly one acceptance rule and gives up after max_candidates."""
+    covariates = np.arange(8.0)
+    with pytest.raises(ValueError):
+        randomizer.rerandomization(covariates)
+    with pytest.raises(ValueError):
+        randomizer.rerandomization(covariates, threshold=1.0, acceptance_probability=0.1)
+    with pytest.raises(ValueError):
+        randomizer.rerandomization(covariates, threshold=-1.0, max_candidates=100)
@@ -0,0 +1,56 @@
+import os
+import src.randomizations as rdz
+import src.schedule_files as sf
+import src.schedules as sch
+import numpy as np
+import pytest
+
+def test_exported_schedule_maps_codes_and_records_how_to_regenerate_them(tmp_path):
+    """Test that an exported permuted block schedule is memory-mapped back and can be regenerated from its header."""
+    path = str(tmp_path / 'schedule.bin')
+    randomizer = rdz.Randomizations([], ['Treatment', 'Control'], seed=5, bit_generator='philox')
+    randomizer.export_schedule(path, block_sizes=[2, 4], n_allocations=1001)
+    schedule = sf.ScheduleFile(path)
+    assert isinstance(schedule.codes, np.memmap) and len(schedule) == 1001, "The codes should be memory-mapped"
+    assert schedule.design == {'type': 'permuted_block', 'block_sizes': [2, 4]}, "The design should be recorded"
+    regenerated = rdz.Randomizations([], schedule.groups, seed=schedule.seed_sequence, bit_generator='philox')
+    regenerated.rng.bit_generator.state = schedule.rng_state
+    blocks = np.concatenate(list(regenerated.permuted_block_schedule([2, 4], n_allocations=1001)))
+    assert (blocks[:1001] == schedule.codes).all(), "The seed and state should regenerate the stored codes"
+    assert schedule.allocation(7) == schedule.groups[schedule.codes[7]], "Allocations should map codes to groups"
+
+def test_counter_schedule_export_round_trips(tmp_path):
+    """Test that an exported counter schedule stores exactly its codes, including an empty schedule."""
+    path = str(tmp_path / 'counter.bin')
+    schedule = sch.CounterSchedule(['A', 'B', 'C'], block_sizes=[3, 6], seed=11)
+    schedule.export(path, n_allocations=5000, chunk_size=777)
+    stored = sf.ScheduleFile(path)
+    assert (stored.codes == schedule.codes(0, 5000)).all(), "Chunked export should store the schedule's codes"
+    rebuilt = sch.CounterSchedule(stored.groups, stored.design['block_sizes'], stored.seed_sequence,
+                                  stored.design['frame_size'])
+    assert (rebuilt.codes(4000, 5000) == stored.codes[4000:]).all(), "The header should rebuild the schedule"
+    schedule.export(path, n_allocations=0)
+    assert len(sf.ScheduleFile(path)) == 0, "Empty schedules should round trip"
+
+def test_rejects_files_that_are_not_schedules(tmp_path):
+    """Test that files without the schedule magic bytes or with too few allocations are rejected."""
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a schedule file at all')
+    with pytest.raises(ValueError):
+        sf.ScheduleFile(str(path))
+    with pytest.raises(ValueError):
+        sf.write_schedule(str(path), ['A', 'B'], [np.array([0, 1])], 4, design={'type': 'test'})
+
+def test_failed_write_keeps_the_previous_schedule(tmp_path):
+    """Test that a write that fails part way leaves the existing file unchanged and no temporary files behind."""
+    path = str(tmp_path / 'schedule.bin')
+    sf.write_schedule(path, ['A', 'B'], [np.array([1, 0, 1, 0])], 4, design={'type': 'test'})
+    previous = open(path, 'rb').read()
+    with pytest.raises(ValueError):
+        sf.write_schedule(path, ['A', 'B'], [np.array([0, 1])], 4, design={'type': 'test'})
+    assert open(path, 'rb').read() == previous, "A failed write should keep the previous schedule"
+    assert [p.name for p in tmp_path.iterdir()] == ['schedule.bin'], "A failed write should remove its temporary file"
+    missing = str(tmp_path / 'missing.bin')
+    with pytest.raises(ValueError):
+        sf.write_schedule(missing, ['A', 'B'], [np.array([0, 1])], 4, design={'type': 'test'})
+    assert not os.path.exists(missing), "A failed write should not create the schedule"
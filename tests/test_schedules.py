@@ -0,0 +1,33 @@
+import src.schedules as sch
+import numpy as np
+import pytest
+
+def test_shards_and_single_allocations_match_the_full_schedule():
+    """Test that any range, shard or single allocation equals the same rows of the full schedule."""
+    schedule = sch.CounterSchedule(['A', 'B', 'C'], block_sizes=[3, 6], seed=42)
+    full = schedule.codes(0, 5000)
+    assert (np.concatenate([schedule.shard(k, 7, 5000) for k in range(7)]) == full).all(), \
+        "Shards should reassemble the full schedule"
+    assert (schedule.codes(1234, 2345) == full[1234:2345]).all(), "Ranges should not depend on their start"
+    assert schedule.allocation(4321) == schedule.groups[full[4321]], "Single allocations should be computed directly"
+    assert (sch.CounterSchedule(['A', 'B', 'C'], block_sizes=[3, 6], seed=42).codes(0, 5000) == full).all(), \
+        "The schedule should be a pure function of the seed"
+
+def test_blocks_are_balanced_and_fill_each_frame():
+    """Test that every block holds each group equally often and that the blocks of a frame fill it exactly."""
+    schedule = sch.CounterSchedule(['A', 'B'], block_sizes=[2, 4, 8], seed=7, frame_size=64)
+    blocks = schedule._frame_blocks(np.arange(20))
+    assert (blocks.sum(axis=1) == 64).all(), "Blocks should fill every frame"
+    codes, start = schedule.codes(0, 20 * 64), 0
+    for size in blocks[blocks > 0]:
+        assert np.bincount(codes[start:start + size], minlength=2).tolist() == [size // 2] * 2, "Blocks should be balanced"
+        start += size
+
+def test_independent_allocation_and_bad_arguments():
+    """Test the independent allocation mode and the validation of frames and ranges."""
+    codes = sch.CounterSchedule(['A', 'B'], seed=3).codes(0, 20000)
+    assert abs(np.mean(codes) - 0.5) < 0.02, "Independent allocations should be roughly uniform"
+    with pytest.raises(ValueError):
+        sch.CounterSchedule(['A', 'B'], block_sizes=[4], frame_size=6)
+    with pytest.raises(ValueError):
+        sch.CounterSchedule(['A', 'B'], seed=3).codes(5, 2)
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import src.allocators as alc
+import src.service as svc
+import pytest
+
+def make_allocator():
+    return alc.StratifiedBlockAllocator(['Treatment', 'Control'], block_sizes=[2, 4], seed=5)
+
+def covariates(i):
+    return ('site', i % 3)
+
+def test_concurrent_requests_are_batched_in_arrival_order():
+    """Test that concurrent requests share batches and get the groups of one-at-a-time allocation in arrival order."""
+    async def enrol():
+        service = svc.AllocationService(make_allocator(), window=0.01, max_batch=64)
+        groups = await asyncio.gather(*(service.assign(f'P{i}', covariates(i)) for i in range(200)))
+        return groups, service.n_batches
+
+    groups, n_batches = asyncio.run(enrol())
+    reference = make_allocator()
+    assert groups == [reference.assign(f'P{i}', covariates(i)) for i in range(200)], \
+        "Batching should preserve the arrival order within every stratum"
+    assert n_batches == 4, "Requests should be coalesced into full batches"
+
+def test_invalid_request_only_fails_itself():
+    """Test that an invalid request fails on its own, and that the failed batch leaves no trace in the allocator."""
+    def make_minimization():
+        return alc.MinimizationAllocator(['Treatment', 'Control'], seed=5)
+
+    async def enrol(allocator):
+        service = svc.AllocationService(allocator, window=0.01)
+        return await asyncio.gather(service.assign('P1', ('site', 0)), service.assign('P2', ('site', 1)),
+                                    service.assign('P3', ('site',)), service.assign('P4', (['site'], 1)),
+                                    service.assign('P5', ('site', 0)), return_exceptions=True)
+
+    allocator = make_minimization()
+    results = asyncio.run(enrol(allocator))
+    assert isinstance(results[2], ValueError) and isinstance(results[3], ValueError), "Invalid requests should fail"
+    reference = make_minimization()
+    expected = [reference.assign(participant, covariates)
+                for participant, covariates in [('P1', ('site', 0)), ('P2', ('site', 1)), ('P5', ('site', 0))]]
+    assert [results[0], results[1], results[4]] == expected, "Valid requests should be allocated as if alone"
+    assert allocator.n_assigned == 3 and allocator.level_counts.sum() == 6, "Each valid request should count once"
+    assert allocator.get_state() == reference.get_state(), "The failed batch should not change the allocator state"
+
+def test_invalid_batch_leaves_the_allocator_unchanged():
+    """Test that assign_many checks the whole batch before allocating any of it."""
+    allocator = alc.MinimizationAllocator(['Treatment', 'Control'], seed=5)
+    allocator.assign('P0', ('site', 0))
+    state = allocator.get_state()
+    with pytest.raises(ValueError):
+        allocator.assign_many(['P1', 'P2', 'P3'], [('site', 0), ('site', 1), ('site',)])
+    assert allocator.get_state() == state, "A rejected batch should not change the allocator"
+
+def test_server_answers_pipelined_requests_in_order():
+    """Test the newline-delimited JSON protocol over a local TCP connection."""
+    async def enrol():
+        service = svc.AllocationService(make_allocator())
+        server = await service.serve('127.0.0.1', 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        reader, writer = await asyncio.open_connection(host, port)
+        for i in range(20):
+            writer.write(json.dumps({'participant': f'P{i}', 'covariates': list(covariates(i))}).encode() + b'\n')
+        writer.write(b'not json\n')
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in range(21)]
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    responses = asyncio.run(enrol())
+    reference = make_allocator()
+    assert responses[:20] == [{'participant': f'P{i}', 'group': reference.assign(f'P{i}', covariates(i))}
+                              for i in range(20)], "Responses should come back in request order"
+    assert 'error' in responses[20], "A malformed request should get an error response"
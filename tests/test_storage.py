@@ -0,0 +1,45 @@
+import src.allocators as alc
+import src.storage as sto
+import pytest
+
+def covariates(i):
+    return (f'site {i % 5}', i % 2)
+
+def make_allocator():
+    return alc.MinimizationAllocator(['Treatment', 'Control'], p=0.8, seed=3)
+
+def test_crashed_store_resumes_from_the_last_committed_batch(tmp_path):
+    """Test that a store reopened after a crash continues exactly like an allocator that was never interrupted."""
+    path = str(tmp_path / 'trial.db')
+    store = sto.AllocationStore(path, make_allocator(), batch_size=16)
+    for i in range(100):
+        store.assign(f'P{i}', covariates(i))
+    store.connection.close()  # crash: the last 4 allocations were never committed
+
+    resumed = sto.AllocationStore(path, make_allocator(), batch_size=16)
+    assert resumed.allocator.n_assigned == 96, "The state of the last committed batch should be restored"
+    reference = make_allocator()
+    for i in range(96):
+        reference.assign(f'P{i}', covariates(i))
+    assert [resumed.assign(f'P{i}', covariates(i)) for i in range(96, 150)] == \
+        [reference.assign(f'P{i}', covariates(i)) for i in range(96, 150)], "Allocation should resume without replay"
+    resumed.close()
+
+def test_store_lookups_and_repeat_enrollment(tmp_path):
+    """Test participant and stratum lookups, WAL mode and that a repeated participant keeps their group."""
+    with sto.AllocationStore(str(tmp_path / 'trial.db'), make_allocator(), batch_size=8) as store:
+        groups = [store.assign(f'P{i}', covariates(i)) for i in range(20)]
+        assert store.assign('P3', covariates(3)) == groups[3], "A repeated participant should keep their group"
+        assert store.allocator.n_assigned == 20, "A repeated participant should not advance the allocator"
+        store.commit()
+        assert store.group_of('P17') == groups[17] and store.group_of('P99') is None, "Lookups should use the index"
+        assert sum(store.stratum_counts(covariates(0)).values()) == 2, "Strata should be counted"
+        assert store.connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal', "The store should use WAL"
+
+def test_store_rejects_a_different_allocator(tmp_path):
+    """Test that a store refuses to restore its state into a different kind of allocator."""
+    path = str(tmp_path / 'trial.db')
+    with sto.AllocationStore(path, make_allocator()) as store:
+        store.assign('P1', covariates(1))
+    with pytest.raises(ValueError):
+        sto.AllocationStore(path, alc.SimpleAllocator(['Treatment', 'Control'], seed=3))